@@ -0,0 +1,177 @@
+from abc import ABCMeta, abstractmethod
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+import atexit
+import base64
+import gzip
+import json
+import logging
+import queue
+import threading
+
+from config import Config
+
+logger = logging.getLogger("app_log")
+
+MIXPANEL_TRACK_URL = "https://api.mixpanel.com/track"
+MIXPANEL_MAX_BATCH = 50
+LOG_EVENT_PREFIX = "ANALYTICS_EVENT "
+
+
+def send_to_mixpanel(events: List[Dict]):
+    import requests
+
+    for i in range(0, len(events), MIXPANEL_MAX_BATCH):
+        batch = [
+            {
+                "event": event["event"],
+                "properties": {
+                    **event["properties"],
+                    "token": Config.MIXPANEL_PROJECT_TOKEN,
+                },
+            }
+            for event in events[i : i + MIXPANEL_MAX_BATCH]
+        ]
+        response = requests.post(
+            MIXPANEL_TRACK_URL,
+            params={"strict": "1"},
+            headers={"Content-Type": "application/json"},
+            data=json.dumps(batch),
+            timeout=10,
+        )
+        # Strict mode answers 400 with the reason when a batch is rejected.
+        if response.status_code != 200:
+            raise RuntimeError(
+                f"Mixpanel rejected {len(batch)} events: "
+                f"{response.status_code} {response.text}"
+            )
+
+
+def send_to_sqs(events: List[Dict]):
+    from clients import get_sqs_client
+
+    get_sqs_client().send_message(
+        QueueUrl=Config.ANALYTICS_QUEUE_URL, MessageBody=json.dumps(events)
+    )
+
+
+class AnalyticsSink(metaclass=ABCMeta):
+    @abstractmethod
+    def track(self, event: str, properties: Dict): ...
+
+    def flush(self):
+        pass
+
+
+class BufferedSink(AnalyticsSink):
+    """Queues events in process and ships them from a background thread.
+
+    A batch is sent every `flush_interval` seconds, or as soon as
+    `batch_size` events are waiting. `track` never blocks: when the queue is
+    full the event is dropped. Meant for long-running processes: on Lambda
+    the thread is frozen once a response is sent and events still queued
+    when the container is reaped are lost, so Lambdas use LogSink.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[List[Dict]], None],
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_queue: Optional[int] = None,
+    ):
+        self.send = send
+        self.batch_size = batch_size or Config.ANALYTICS_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.ANALYTICS_FLUSH_INTERVAL
+        self._queue: "queue.Queue[Dict]" = queue.Queue(
+            maxsize=max_queue or Config.ANALYTICS_QUEUE_SIZE
+        )
+        self._wakeup = threading.Event()
+        self._send_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="analytics", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def track(self, event: str, properties: Dict):
+        try:
+            self._queue.put_nowait({"event": event, "properties": properties})
+        except queue.Full:
+            logger.error(f"Analytics queue full, dropping event {event}")
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def _drain(self) -> List[Dict]:
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def flush(self):
+        with self._send_lock:
+            events = self._drain()
+            if not events:
+                return
+            try:
+                self.send(events)
+            except Exception as e:
+                logger.error(f"Could not send {len(events)} analytics events: {e}")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+class LogSink(AnalyticsSink):
+    """Writes each event as one log line for a log subscription to ship.
+
+    The default: the line is in CloudWatch before the response is sent, and
+    `ship_analytics` forwards it from the subscription in serverless.yml.
+    """
+
+    def track(self, event: str, properties: Dict):
+        logger.info(
+            LOG_EVENT_PREFIX + json.dumps({"event": event, "properties": properties})
+        )
+
+
+class StubSink(AnalyticsSink):
+    def __init__(self):
+        self.events: List[Dict] = []
+
+    def track(self, event: str, properties: Dict):
+        self.events.append({"event": event, "properties": properties})
+
+
+class NullSink(AnalyticsSink):
+    def track(self, event: str, properties: Dict):
+        pass
+
+
+@lru_cache(maxsize=None)
+def get_analytics_sink() -> AnalyticsSink:
+    sink = Config.ANALYTICS_SINK
+    if sink == "buffered":
+        return BufferedSink(send_to_mixpanel)
+    if sink == "sqs":
+        return BufferedSink(send_to_sqs)
+    if sink == "log":
+        return LogSink()
+    if sink == "stub":
+        return StubSink()
+    return NullSink()
+
+
+def parse_log_subscription(data: str) -> List[Dict]:
+    """Events from a CloudWatch Logs subscription payload written by LogSink."""
+    payload = json.loads(gzip.decompress(base64.b64decode(data)))
+    events = []
+    for log_event in payload.get("logEvents", []):
+        message = log_event["message"]
+        if LOG_EVENT_PREFIX in message:
+            events.append(json.loads(message.split(LOG_EVENT_PREFIX, 1)[1]))
+    return events
@@ -1,11 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
 import json
-from typing import List
+import os
+from typing import List, Optional, Tuple
 
-import boto3
 import base64
-from image_processor import resize_image
+from cache import LRUByteCache
+from clients import get_s3_client
 from config import Config
-import psycopg2
+from db import get_project_tracker
+
+resized_image_cache = LRUByteCache(Config.RESIZED_IMAGE_CACHE_BYTES)
+manifest_cache = LRUByteCache(
+    Config.MANIFEST_CACHE_BYTES, ttl=Config.MANIFEST_CACHE_TTL
+)
+_metadata_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_metadata_executor() -> ThreadPoolExecutor:
+    """Threads for concurrent S3 reads, kept across warm invocations."""
+    global _metadata_executor
+    if _metadata_executor is None:
+        _metadata_executor = ThreadPoolExecutor(
+            max_workers=Config.COLLECTION_METADATA_CONCURRENCY,
+            thread_name_prefix="metadata",
+        )
+    return _metadata_executor
 
 
 class AssetFetcher:
@@ -109,15 +128,168 @@ class AssetFetcher:
 
     @staticmethod
     def _resize_image(content, target_height, target_width):
+        from image_processor import resize_image
+
         output_buffer = resize_image(content, target_height, target_width)
         output = output_buffer.getvalue()
         return output
 
+    @staticmethod
+    def _parse_dimension(value: Optional[str]) -> Optional[int]:
+        """A requested width or height, capped at the largest rendition.
+
+        The cap bounds the resized objects a caller can make us write to S3.
+        """
+        if value is None:
+            return None
+        dimension = int(value)
+        if dimension <= 0:
+            raise ValueError(f"Invalid image dimension: {value}")
+        return min(dimension, max(Config.IMAGE_RENDITIONS))
+
+    @staticmethod
+    def _get_resized_image_key(token_id: str, req_height, req_width) -> str:
+        # The height wins when both are given, as in `resize_image`.
+        if req_height:
+            return f"assets/images/{token_id}/w0h{int(req_height)}/image"
+        return f"assets/images/{token_id}/w{int(req_width)}h0/image"
+
+    @staticmethod
+    def _get_manifest_key(token_id: str) -> str:
+        return f"assets/manifests/{token_id}/manifest.json"
+
+    def _get_manifest(self, s3, bucket, token_id) -> Optional[dict]:
+        """Read the asset manifest written at ingest, or None for legacy tokens.
+
+        Manifests are cached for MANIFEST_CACHE_TTL seconds, so a re-ingest is
+        picked up. A missing manifest is not cached: the token may be ingested
+        later.
+        """
+        key = self._get_manifest_key(token_id)
+        cached = manifest_cache.get(key)
+        if cached is None:
+            try:
+                content = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+            except s3.exceptions.NoSuchKey:
+                return None
+            cached = content, "application/json"
+            manifest_cache.put(key, *cached)
+        return json.loads(cached[0])
+
+    @staticmethod
+    def _find_legacy_asset_key(s3, bucket, keys: List[str]) -> Optional[str]:
+        """Return the first of `keys` that exists, using one prefix listing."""
+        response = s3.list_objects_v2(Bucket=bucket, Prefix=os.path.commonprefix(keys))
+        existing = {obj["Key"] for obj in response.get("Contents", [])}
+        return next((key for key in keys if key in existing), None)
+
+    def _resolve_asset(
+        self, s3, bucket, asset_type, token_id
+    ) -> Optional[Tuple[str, Optional[str]]]:
+        manifest = self._get_manifest(s3, bucket, token_id)
+        if manifest is not None and asset_type in manifest["assets"]:
+            asset = manifest["assets"][asset_type]
+            return asset["key"], asset["content_type"]
+        keys = self._get_possible_keys_for_asset(asset_type, token_id)
+        key = self._find_legacy_asset_key(s3, bucket, keys)
+        if key is None:
+            return None
+        content_type = self.asset_to_content_type_mapping[asset_type]
+        if content_type is None:
+            content_type = self._get_content_type_from_asset_key(key, asset_type)
+        return key, content_type
+
+    @staticmethod
+    def _pick_rendition(
+        renditions: List[dict], req_height, req_width
+    ) -> Optional[dict]:
+        dimension = "height" if req_height else "width"
+        target = int(req_height) if req_height else int(req_width)
+        candidates = [
+            rendition for rendition in renditions if rendition[dimension] >= target
+        ]
+        return min(candidates, key=lambda rendition: rendition[dimension], default=None)
+
+    def _fetch_image_rendition(
+        self, s3, bucket, token_id, req_height, req_width
+    ) -> Optional[Tuple[str, bytes, bool]]:
+        """Serve a resize request from the smallest stored rendition that covers it.
+
+        Returns the content type, the content and whether it had to be resized.
+        """
+        target = int(req_height) if req_height else int(req_width)
+        manifest = self._get_manifest(s3, bucket, token_id)
+        if manifest is not None and "image" in manifest["assets"]:
+            rendition = self._pick_rendition(
+                manifest["assets"]["image"].get("renditions", []),
+                req_height,
+                req_width,
+            )
+            if rendition is None:
+                return None
+            obj = s3.get_object(Bucket=bucket, Key=rendition["key"])
+            content = obj["Body"].read()
+            dimension = rendition["height"] if req_height else rendition["width"]
+            if dimension == target:
+                return rendition["content_type"], content, False
+            resized = self._resize_image(content, req_height, req_width)
+            return "image/jpeg", resized, True
+        # Tokens rendered before manifests: one listing finds the smallest
+        # rendition covering the height. Their widths are unknown, so width
+        # requests resize the original.
+        if not req_height:
+            return None
+        sizes = {
+            f"assets/images/{token_id}/{size}px/image": size
+            for size in Config.IMAGE_RENDITIONS
+            if size >= target
+        }
+        key = self._find_legacy_asset_key(s3, bucket, list(sizes)) if sizes else None
+        if key is None:
+            return None
+        obj = s3.get_object(Bucket=bucket, Key=key)
+        content = obj["Body"].read()
+        if sizes[key] == target:
+            return obj["ContentType"], content, False
+        resized = self._resize_image(content, req_height, req_width)
+        return "image/jpeg", resized, True
+
+    def _fetch_resized_image(
+        self, s3, bucket, token_id, req_height, req_width
+    ) -> Optional[Tuple[str, bytes]]:
+        key = self._get_resized_image_key(token_id, req_height, req_width)
+        cached = resized_image_cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return content_type, content
+        try:
+            obj = s3.get_object(Bucket=bucket, Key=key)
+            content = obj["Body"].read()
+            content_type = obj["ContentType"]
+        except s3.exceptions.NoSuchKey:
+            rendition = self._fetch_image_rendition(
+                s3, bucket, token_id, req_height, req_width
+            )
+            if rendition is None:
+                original = self._resolve_asset(s3, bucket, "image", token_id)
+                if original is None:
+                    return None
+                original_key, _content_type = original
+                content = s3.get_object(Bucket=bucket, Key=original_key)["Body"].read()
+                resized = self._resize_image(content, req_height, req_width)
+                rendition = "image/jpeg", resized, True
+            content_type, content, derived = rendition
+            if derived:
+                s3.put_object(
+                    Bucket=bucket, Key=key, Body=content, ContentType=content_type
+                )
+        resized_image_cache.put(key, content, content_type)
+        return content_type, content
+
     def fetch(self, asset_type: str):
         if asset_type not in self.asset_to_content_type_mapping.keys():
             return {"statusCode": 400}
-        session = boto3.Session()
-        s3 = session.client("s3")
+        s3 = get_s3_client()
         bucket = Config.DATA_DUMP_BUCKET
 
         params = self.event["pathParameters"]
@@ -128,81 +300,94 @@ class AssetFetcher:
             req_height = query_params.get("height")
             req_width = query_params.get("width")
         token_id = params.get("token_id")
+        try:
+            req_height = self._parse_dimension(req_height)
+            req_width = self._parse_dimension(req_width)
+        except ValueError:
+            return {"statusCode": 400, "body": "invalid height or width"}
 
-        keys = self._get_possible_keys_for_asset(asset_type, token_id)
-        content_type = self.asset_to_content_type_mapping[asset_type]
+        try:
+            if asset_type == "image" and (
+                req_height is not None or req_width is not None
+            ):
+                resized = self._fetch_resized_image(
+                    s3, bucket, token_id, req_height, req_width
+                )
+                if resized is not None:
+                    return self.get_success_response(*resized)
+                return {"statusCode": 400}
 
-        for key in keys:
-            try:
-                obj = s3.get_object(Bucket=bucket, Key=key)
-                body = obj["Body"]
-                content = body.read()
-                if content_type is None:
-                    content_type = self._get_content_type_from_asset_key(
-                        key, asset_type
-                    )
-                if asset_type == "image" and (
-                    req_height is not None or req_width is not None
-                ):
-                    content = self._resize_image(content, req_height, req_width)
-                return self.get_success_response(content_type, content)
-            except Exception as e:
-                print(e, key)
-                continue
+            asset = self._resolve_asset(s3, bucket, asset_type, token_id)
+            if asset is None:
+                return {"statusCode": 400}
+            key, content_type = asset
+            obj = s3.get_object(Bucket=bucket, Key=key)
+            content = obj["Body"].read()
+            return self.get_success_response(content_type, content)
+        except Exception as e:
+            print(e, token_id)
         return {"statusCode": 400}
 
     def fetch_project_metadata(self):
-        session = boto3.Session()
-        s3 = session.client("s3")
+        s3 = get_s3_client()
         bucket = Config.DATA_DUMP_BUCKET
 
         params = self.event["pathParameters"]
-        query_params = self.event.get("queryStringParameters")
+        query_params = self.event.get("queryStringParameters") or {}
 
         issuer = params.get("issuer")
-        taxon = params.get("taxon")
-        page_num = int(query_params.get("page")) if query_params else 1
+        try:
+            taxon = int(params.get("taxon"))
+            page_num = int(query_params.get("page", 1))
+            page_size = int(query_params.get("limit", Config.COLLECTION_PAGE_SIZE))
+        except (TypeError, ValueError):
+            return {"statusCode": 400, "body": "invalid taxon, page or limit"}
+        cursor = query_params.get("cursor")
 
         if int(page_num) <= 0:
             return {"statusCode": 400, "body": "invalid page number"}
+        if not 0 < page_size <= Config.COLLECTION_MAX_PAGE_SIZE:
+            return {"statusCode": 400, "body": "invalid limit"}
 
-        query = ""
-        if page_num == 1:
-            query = f"SELECT nft_token_id FROM project_tracker WHERE issuer = '{issuer}' AND taxon = {taxon} LIMIT 10"
+        project_tracker = get_project_tracker()
+        if cursor:
+            token_ids = project_tracker.fetch_token_ids_after(
+                issuer, taxon, page_size, after=cursor
+            )
+        elif page_num == 1:
+            token_ids = project_tracker.fetch_token_ids_after(issuer, taxon, page_size)
         else:
-            offset = (page_num - 1) * 10
-            query = f"SELECT nft_token_id FROM project_tracker WHERE issuer = '{issuer}' AND taxon = {taxon} LIMIT 10 OFFSET {offset}"
-        count_query = f"SELECT COUNT(nft_token_id) FROM project_tracker WHERE issuer = '{issuer}' AND taxon = {taxon}"
-
-        connection = psycopg2.connect(
-            user=Config.RDS_USER,
-            password=Config.RDS_PASSWORD,
-            host=Config.DB_HOST,
-            port=Config.RDS_PORT,
-            database=Config.DB_NAME,
-        )
-        cursor = connection.cursor()
-
-        cursor.execute(query)
-        token_ids = cursor.fetchall()
-        cursor.execute(count_query)
-        total_ids = cursor.fetchall()[0][0]
+            token_ids = project_tracker.fetch_token_ids_page(
+                issuer, taxon, page_size, page_num
+            )
+        total_ids = project_tracker.count(issuer, taxon)
         keys = [
-            (token_id[0], f"assets/metadata/{token_id[0]}/metadata")
-            for token_id in token_ids
+            (token_id, f"assets/metadata/{token_id}/metadata") for token_id in token_ids
         ]
-        metadatas = []
 
-        for token_id, key in keys:
+        def read_metadata(token_id, key):
             try:
                 obj = s3.get_object(Bucket=bucket, Key=key)
                 body = obj["Body"]
                 content = body.read()
                 to_dict = json.loads(content)
-                metadatas.append({"token_id": token_id, "metadata": to_dict})
+                return {"token_id": token_id, "metadata": to_dict}
             except Exception as e:
                 print(f"Error Fetching Metadata for TokenID: {token_id}\n{e}")
-        results = {"data": metadatas, "count": total_ids, "current_page": page_num}
+
+        metadatas = [
+            metadata
+            for metadata in get_metadata_executor().map(
+                lambda item: read_metadata(*item), keys
+            )
+            if metadata is not None
+        ]
+        results = {
+            "data": metadatas,
+            "count": total_ids,
+            "current_page": None if cursor else page_num,
+            "next_cursor": token_ids[-1] if len(token_ids) == page_size else None,
+        }
         content = bytes(json.dumps(results), "utf-8")
         content_type = "application/json"
         return self.get_success_response(content_type, content)
@@ -0,0 +1,98 @@
+"""Cold start benchmark for the Lambda handlers.
+
+Every handler runs in a fresh interpreter, the way a cold Lambda does. For
+each one we report how long `import handlers` took, how long the first
+invocation took, and which heavy modules ended up loaded. The invocation
+calls the real handler, so it needs AWS credentials and a token that
+exists in DATA_DUMP_BUCKET. Use --no-invoke to measure imports only.
+
+    python benchmarks/cold_start.py --token-id <NFTokenID>
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["engine", "aiohttp", "aioboto3", "PIL", "psycopg2", "requests"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import handlers
+import_ms = (time.perf_counter() - start) * 1000
+invoke_ms, status = None, None
+if {invoke}:
+    start = time.perf_counter()
+    try:
+        result = getattr(handlers, {handler!r})({event}, None)
+        status = (result or {{}}).get("statusCode")
+    except Exception as e:
+        status = repr(e)
+    invoke_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{
+    "import_ms": import_ms,
+    "invoke_ms": invoke_ms,
+    "status": status,
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def handler_events(token_id, issuer, taxon):
+    token_event = {"pathParameters": {"token_id": token_id}}
+    return {
+        "fetch_images_handler": token_event,
+        "fetch_thumbnail_handler": token_event,
+        "fetch_animation_handler": token_event,
+        "fetch_metadata_handler": token_event,
+        "fetch_audio_handler": token_event,
+        "fetch_video_handler": token_event,
+        "fetch_project_metadata": {
+            "pathParameters": {"issuer": issuer, "taxon": taxon},
+            "queryStringParameters": None,
+        },
+    }
+
+
+def measure(handler, event, invoke):
+    code = PROBE.format(
+        invoke=invoke, handler=handler, event=repr(event), heavy=HEAVY_MODULES
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--token-id", default="")
+    parser.add_argument("--issuer", default="")
+    parser.add_argument("--taxon", default="0")
+    parser.add_argument("--no-invoke", action="store_true")
+    parser.add_argument("--handler", action="append", help="Only run these handlers")
+    args = parser.parse_args()
+
+    events = handler_events(args.token_id, args.issuer, args.taxon)
+    handlers = args.handler or list(events)
+    print(f"{'handler':<26}{'import ms':>10}{'invoke ms':>11}  status  heavy modules")
+    for handler in handlers:
+        result = measure(handler, events[handler], not args.no_invoke)
+        invoke_ms = result["invoke_ms"]
+        print(
+            f"{handler:<26}{result['import_ms']:>10.1f}"
+            f"{'-' if invoke_ms is None else f'{invoke_ms:.1f}':>11}"
+            f"  {result['status']}  {', '.join(result['loaded']) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Collection page queries: OFFSET pages against keyset pages.
+
+Runs ProjectTrackerRepository against an in-memory SQLite stand-in for
+`project_tracker`, so it needs no database:
+
+    python benchmarks/collection_pagination.py --tokens 200000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import ProjectTrackerRepository  # noqa: E402
+
+ISSUER = "rIssuer"
+TAXON = 1
+
+
+def build_database(tokens: int):
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        "CREATE TABLE project_tracker (issuer TEXT, taxon INTEGER, nft_token_id TEXT)"
+    )
+    connection.execute(
+        "CREATE INDEX project_tracker_collection "
+        "ON project_tracker (issuer, taxon, nft_token_id)"
+    )
+    connection.executemany(
+        "INSERT INTO project_tracker VALUES (?, ?, ?)",
+        ((ISSUER, TAXON, f"{i:064X}") for i in range(tokens)),
+    )
+    connection.commit()
+    return connection
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    connection = build_database(args.tokens)
+    repository = ProjectTrackerRepository(lambda: connection, placeholder="?")
+    last_page = args.tokens // args.page_size
+
+    print(f"{'page':>8}{'offset ms':>12}{'keyset ms':>12}")
+    for page in [1, last_page // 100, last_page // 10, last_page // 2, last_page]:
+        page = max(page, 1)
+        after = None if page == 1 else f"{(page - 1) * args.page_size - 1:064X}"
+        offset_ms = timed(
+            lambda: repository.fetch_token_ids_page(
+                ISSUER, TAXON, args.page_size, page
+            ),
+            args.repeat,
+        )
+        keyset_ms = timed(
+            lambda: repository.fetch_token_ids_after(
+                ISSUER, TAXON, args.page_size, after
+            ),
+            args.repeat,
+        )
+        print(f"{page:>8}{offset_ms:>12.3f}{keyset_ms:>12.3f}")
+
+    repository.count_ttl = 0
+    uncached_ms = timed(lambda: repository.count(ISSUER, TAXON), args.repeat)
+    repository.count_ttl = 300
+    repository.count(ISSUER, TAXON)
+    cached_ms = timed(lambda: repository.count(ISSUER, TAXON), args.repeat)
+    print(f"count: {uncached_ms:.3f} ms uncached, {cached_ms:.4f} ms cached")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Domain to token URI resolution: the old if/elif chain against DomainResolver.
+
+Runs over a corpus of issuer Domains shaped like the ones seen on URI-less
+mints, with extra marketplace rules loaded the way DOMAIN_RESOLVER_RULES
+would load them:
+
+    python benchmarks/domain_resolver.py --rules 50 --repeat 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain_resolver import DEFAULT_RULES, DomainResolver  # noqa: E402
+from utils import is_ipfs  # noqa: E402
+
+TOKEN_ID = "000800006203F49C21D5D6E022CB16DE3538F248662FC73C00000B2B00000099"
+
+CORPUS = [
+    "ipfs://bafybeigdyrzt5sfp7udm7hu76uh7y26nf3efuylqabf3oclgtqy55fbzdi/",
+    "ipfs://QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG/",
+    "https://default-example.com",
+    "https://marketplace-api.onxrp.com/api/metadata/",
+    "https://nft.xrpl.example/collections/42/meta/",
+    "https://api.sologenic.org/nft/metadata/",
+    "https://unknown-issuer.example/",
+]
+
+
+def if_elif_chain(domain, token_id):
+    if domain == "https://default-example.com":
+        return f"{domain}/.well-known/xrpl-nft/{token_id}"
+    elif domain == "https://marketplace-api.onxrp.com/api/metadata/":
+        return f"{domain}{token_id}.json"
+    elif is_ipfs(domain):
+        return f"{domain}{token_id}.json"
+    return None
+
+
+def marketplace_rules(count: int):
+    rules = [
+        {
+            "match": "regex",
+            "pattern": r"https://nft\.xrpl\.example/collections/(?P<collection>\d+)/meta/$",
+            "template": "{domain}{token_id}",
+        },
+        {
+            "match": "prefix",
+            "pattern": "https://api.sologenic.org/nft/",
+            "template": "{domain}{token_id}.json",
+        },
+    ]
+    for i in range(count):
+        rules.append(
+            {
+                "match": "exact",
+                "pattern": f"https://marketplace-{i}.example/metadata/",
+                "template": "{domain}{token_id}.json",
+            }
+        )
+        rules.append(
+            {
+                "match": "prefix",
+                "pattern": f"https://cdn-{i}.example/",
+                "template": "{domain}{token_id}",
+            }
+        )
+    return rules
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for domain in CORPUS:
+            fn(domain, TOKEN_ID)
+    return (time.perf_counter() - start) / (repeat * len(CORPUS)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    resolver = DomainResolver(marketplace_rules(args.rules), DEFAULT_RULES)
+    build_ms = (time.perf_counter() - start) * 1000
+    default_resolver = DomainResolver([], DEFAULT_RULES)
+    rule_count = len(resolver)
+
+    for domain in CORPUS:
+        print(f"{domain:<72} -> {resolver.resolve(domain, '<id>')}")
+    print()
+    print(f"{'resolver':<36}{'us/domain':>12}")
+    print(f"{'if/elif chain':<36}{timed(if_elif_chain, args.repeat):>12.3f}")
+    print(
+        f"{'registry, default rules':<36}"
+        f"{timed(default_resolver.resolve, args.repeat):>12.3f}"
+    )
+    print(
+        f"{f'registry, {rule_count} rules':<36}"
+        f"{timed(resolver.resolve, args.repeat):>12.3f}"
+    )
+    print(f"\nCompiling {rule_count} rules took {build_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
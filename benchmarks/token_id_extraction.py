@@ -0,0 +1,191 @@
+"""NFTokenID extraction: the multi-pass, hash(str(token)) extractor against the
+single-pass diff in TokenIDExtractor.
+
+Uses a saved corpus of ledger transactions (JSON list or JSONL, `tx` results
+or ledger dump entries) when given, otherwise a generated one with the page
+shapes NFTokenMint produces: a mint into an existing page, a first mint
+creating a page, and a mint that splits a full page.
+
+    python benchmarks/token_id_extraction.py --corpus transactions.jsonl
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractors import TokenIDExtractor  # noqa: E402
+
+
+class LegacyTokenIDExtractor:
+    """TokenIDExtractor.extract as it was before the single-pass rewrite."""
+
+    def __init__(self, data):
+        self._data = data
+
+    def extract(self):
+        affected_nodes = self._data["meta"]["AffectedNodes"]
+        modified = [
+            node
+            for node in [node for node in affected_nodes if node.get("ModifiedNode")]
+            if node["ModifiedNode"]["LedgerEntryType"] == "NFTokenPage"
+        ]
+        created = [
+            node
+            for node in [node for node in affected_nodes if node.get("CreatedNode")]
+            if node["CreatedNode"]["LedgerEntryType"] == "NFTokenPage"
+        ]
+        tokens = []
+        for node in modified:
+            tokens.extend(node["ModifiedNode"]["FinalFields"]["NFTokens"])
+            if node["ModifiedNode"]["PreviousFields"].get("NFTokens"):
+                tokens.extend(node["ModifiedNode"]["PreviousFields"]["NFTokens"])
+        for node in created:
+            tokens.extend(node["CreatedNode"]["NewFields"]["NFTokens"])
+        hash_map = {}
+        for token in tokens:
+            token_hash = hash(str(token))
+            if not hash_map.get(token_hash):
+                hash_map[token_hash] = {"count": 1, "token": token}
+            else:
+                hash_map[token_hash]["count"] += 1
+        targets = [item["token"] for item in hash_map.values() if item["count"] == 1]
+        if len(targets) != 1:
+            return None
+        return targets[0]["NFToken"]["NFTokenID"]
+
+
+def token(rng: random.Random):
+    return {
+        "NFToken": {
+            "NFTokenID": f"{rng.getrandbits(256):064X}",
+            "URI": "697066733A2F2F" + f"{rng.getrandbits(128):032X}",
+        }
+    }
+
+
+def other_node(rng: random.Random):
+    return {
+        "ModifiedNode": {
+            "LedgerEntryType": "AccountRoot",
+            "FinalFields": {"Balance": str(rng.randint(1, 10**9)), "MintedNFTokens": 7},
+            "PreviousFields": {"Balance": str(rng.randint(1, 10**9))},
+        }
+    }
+
+
+def mint(rng: random.Random, page_size: int, new_tokens: int = 1):
+    existing = [token(rng) for _ in range(page_size)]
+    minted = [token(rng) for _ in range(new_tokens)]
+    shape = rng.choice(["existing", "created", "split"])
+    if shape == "created":
+        pages = [
+            {
+                "CreatedNode": {
+                    "LedgerEntryType": "NFTokenPage",
+                    "NewFields": {"NFTokens": minted},
+                }
+            }
+        ]
+    elif shape == "existing":
+        pages = [
+            {
+                "ModifiedNode": {
+                    "LedgerEntryType": "NFTokenPage",
+                    "FinalFields": {"NFTokens": existing + minted},
+                    "PreviousFields": {"NFTokens": existing},
+                }
+            }
+        ]
+    else:
+        half = len(existing) // 2
+        pages = [
+            {
+                "ModifiedNode": {
+                    "LedgerEntryType": "NFTokenPage",
+                    "FinalFields": {"NFTokens": existing[:half]},
+                    "PreviousFields": {"NFTokens": existing},
+                }
+            },
+            {
+                "CreatedNode": {
+                    "LedgerEntryType": "NFTokenPage",
+                    "NewFields": {"NFTokens": existing[half:] + minted},
+                }
+            },
+        ]
+    nodes = pages + [other_node(rng) for _ in range(3)]
+    rng.shuffle(nodes)
+    return {
+        "TransactionType": "NFTokenMint",
+        "meta": {"TransactionResult": "tesSUCCESS", "AffectedNodes": nodes},
+    }
+
+
+def load_corpus(path: str):
+    with open(path, "r") as f:
+        if path.endswith(".jsonl"):
+            items = [json.loads(line) for line in f if line.strip()]
+        else:
+            items = json.load(f)
+    transactions = [item.get("result", item) for item in items]
+    # The legacy extractor only reads `meta`.
+    for transaction in transactions:
+        if "meta" not in transaction and "metaData" in transaction:
+            transaction["meta"] = transaction["metaData"]
+    return transactions
+
+
+def timed(extract, transactions, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for transaction in transactions:
+            try:
+                extract(transaction)
+            except Exception:  # noqa
+                pass
+    return (time.perf_counter() - start) / (repeat * len(transactions)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="JSON or JSONL file of transactions")
+    parser.add_argument("--transactions", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.corpus:
+        transactions = load_corpus(args.corpus)
+    else:
+        rng = random.Random(0)
+        transactions = [
+            mint(rng, rng.randint(1, args.page_size)) for _ in range(args.transactions)
+        ]
+
+    legacy_ids = [LegacyTokenIDExtractor(txn).extract() for txn in transactions]
+    single_ids = [TokenIDExtractor(txn).extract() for txn in transactions]
+    mismatches = sum(1 for a, b in zip(legacy_ids, single_ids) if a != b)
+    print(f"{len(transactions)} transactions, {mismatches} differing token ids\n")
+
+    print(f"{'extractor':<32}{'us/txn':>10}")
+    legacy_us = timed(
+        lambda txn: LegacyTokenIDExtractor(txn).extract(), transactions, args.repeat
+    )
+    print(f"{'multi-pass, hash(str(token))':<32}{legacy_us:>10.2f}")
+    single_us = timed(
+        lambda txn: TokenIDExtractor(txn).extract(), transactions, args.repeat
+    )
+    print(f"{'single-pass diff':<32}{single_us:>10.2f}")
+    all_us = timed(
+        lambda txn: TokenIDExtractor(txn).extract_all(), transactions, args.repeat
+    )
+    print(f"{'single-pass diff, extract_all':<32}{all_us:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from config import Config
+
+logger = logging.getLogger("app_log")
+
+CacheEntry = Tuple[bytes, str]
+
+
+def normalize_cid_path(ipfs_path: str) -> str:
+    return "/".join(part for part in ipfs_path.split("/") if part)
+
+
+class LRUByteCache:
+    """In-memory LRU bounded by total content size.
+
+    With a `ttl`, entries are dropped that many seconds after they were put.
+    """
+
+    def __init__(self, max_bytes: int, ttl: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._expires: Dict[str, float] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _pop(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.pop(key, None)
+        self._expires.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+        return entry
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and self._expires[key] <= time.monotonic():
+            self._pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, content: bytes, content_type: str):
+        if len(content) > self.max_bytes:
+            return
+        self._pop(key)
+        self._entries[key] = (content, content_type)
+        if self.ttl is not None:
+            self._expires[key] = time.monotonic() + self.ttl
+        self.size += len(content)
+        while self.size > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+
+
+class DiskByteCache:
+    """Files named by key hash; the least recently used are evicted past `max_bytes`."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory)
+        )
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                content_type = f.readline().decode("utf-8").rstrip("\n")
+                content = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return content, content_type
+
+    def put(self, key: str, content: bytes, content_type: str):
+        path = self._path(key)
+        data = content_type.encode("utf-8") + b"\n" + content
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            try:
+                previous_size = os.path.getsize(path)
+            except OSError:
+                previous_size = 0
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.size += len(data) - previous_size
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        self.size = sum(size for _mtime, size, _path in entries)
+        for _mtime, size, path in entries:
+            if self.size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+
+
+class ContentAddressedCache:
+    """Cache for immutable IPFS content, keyed by normalized CID path.
+
+    IPFS content never changes for a CID, so entries are never revalidated.
+    """
+
+    def __init__(
+        self,
+        memory_bytes: int,
+        max_item_bytes: int,
+        directory: Optional[str] = None,
+        disk_bytes: int = 0,
+    ):
+        self.max_item_bytes = max_item_bytes
+        self.memory = LRUByteCache(memory_bytes)
+        self.disk = (
+            DiskByteCache(directory, disk_bytes) if directory and disk_bytes else None
+        )
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = await asyncio.to_thread(self.disk.get, key)
+            if entry is not None:
+                self.memory.put(key, *entry)
+        return entry
+
+    async def put(self, key: str, content: bytes, content_type: str):
+        if len(content) > self.max_item_bytes:
+            return
+        self.memory.put(key, content, content_type)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.put, key, content, content_type)
+            except OSError as e:
+                logger.error(f"Could not write {key} to the disk cache. Error: {e}")
+
+
+ipfs_cache = ContentAddressedCache(
+    memory_bytes=Config.IPFS_CACHE_MEMORY_BYTES,
+    max_item_bytes=Config.IPFS_CACHE_MAX_ITEM_BYTES,
+    directory=Config.IPFS_CACHE_DIR,
+    disk_bytes=Config.IPFS_CACHE_DISK_BYTES,
+)
@@ -0,0 +1,167 @@
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+import asyncio
+import json
+import logging
+import os
+import time
+
+import boto3
+
+from config import Config
+
+logger = logging.getLogger("app_log")
+
+
+@dataclass
+class Checkpoint:
+    last_key: Optional[str] = None
+    succeeded: int = 0
+    failed: int = 0
+    deleted: int = 0
+    updated_at: float = 0.0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Checkpoint":
+        return cls(
+            last_key=data.get("last_key"),
+            succeeded=data.get("succeeded", 0),
+            failed=data.get("failed", 0),
+            deleted=data.get("deleted", 0),
+            updated_at=data.get("updated_at", 0.0),
+        )
+
+
+class LocalCheckpointStore:
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[Checkpoint]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r") as f:
+            return Checkpoint.from_dict(json.load(f))
+
+    def save(self, data: Dict):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def __str__(self):
+        return self.path
+
+
+class S3CheckpointStore:
+    def __init__(self, bucket: str, key: str):
+        self.bucket = bucket
+        self.key = key
+        self.s3 = boto3.client(
+            "s3",
+            aws_access_key_id=Config.ACCESS_KEY_ID,
+            aws_secret_access_key=Config.SECRET_ACCESS_KEY,
+        )
+
+    def load(self) -> Optional[Checkpoint]:
+        try:
+            res = self.s3.get_object(Bucket=self.bucket, Key=self.key)
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        return Checkpoint.from_dict(json.load(res["Body"]))
+
+    def save(self, data: Dict):
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Body=json.dumps(data),
+            ContentType="application/json",
+        )
+
+    def __str__(self):
+        return f"s3://{self.bucket}/{self.key}"
+
+
+def get_checkpoint_store(location: str, shard_index: int = 0, shard_count: int = 1):
+    """Local path or `s3://bucket/key`; each shard gets its own checkpoint."""
+    if shard_count > 1:
+        root, ext = os.path.splitext(location)
+        location = f"{root}.{shard_index}-of-{shard_count}{ext}"
+    if location.startswith("s3://"):
+        bucket, key = location.replace("s3://", "").split("/", 1)
+        return S3CheckpointStore(bucket, key)
+    return LocalCheckpointStore(location)
+
+
+class CheckpointTracker:
+    """Progress of a run over keys processed in listing order.
+
+    Items finish out of order, so `last_key` only advances past a key once
+    it and every key dispatched before it have finished. Resuming after
+    `last_key` never skips unfinished work; at most the items that were in
+    flight are processed again.
+
+    Saves run one at a time, on a snapshot taken on the event loop; a
+    periodic save is skipped while another is still writing.
+    """
+
+    def __init__(
+        self,
+        store,
+        checkpoint: Optional[Checkpoint] = None,
+        interval: Optional[float] = None,
+    ):
+        self.store = store
+        self.checkpoint = checkpoint or Checkpoint()
+        self.interval = interval if interval is not None else Config.CHECKPOINT_INTERVAL
+        self._pending: "OrderedDict[str, bool]" = OrderedDict()
+        self._saved_at = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        # Created on the running loop; Python 3.9 binds a Lock to its loop.
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    def started(self, key: str):
+        self._pending[key] = False
+
+    def finished(self, key: str, status: str):
+        if status == "deleted":
+            self.checkpoint.deleted += 1
+        elif status == "succeeded":
+            self.checkpoint.succeeded += 1
+        else:
+            self.checkpoint.failed += 1
+        self._pending[key] = True
+        while self._pending:
+            first_key, done = next(iter(self._pending.items()))
+            if not done:
+                break
+            self._pending.popitem(last=False)
+            self.checkpoint.last_key = first_key
+
+    async def save(self):
+        async with self._get_lock():
+            self.checkpoint.updated_at = time.time()
+            self._saved_at = time.monotonic()
+            data = self.checkpoint.to_dict()
+            try:
+                await asyncio.to_thread(self.store.save, data)
+            except Exception as e:  # noqa
+                logger.error(f"Could not save checkpoint to {self.store}. Error: {e}")
+                return
+        logger.info(f"Checkpoint saved to {self.store}: {json.dumps(data)}")
+
+    async def maybe_save(self):
+        if self._get_lock().locked():
+            return
+        if time.monotonic() - self._saved_at >= self.interval:
+            await self.save()
@@ -0,0 +1,34 @@
+from functools import lru_cache
+import boto3
+from botocore.config import Config as BotoConfig
+
+from config import Config
+
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    """S3 client shared by every invocation of a warm Lambda.
+
+    Its connection pool is sized for the concurrent collection page reads.
+    """
+    return boto3.Session().client(
+        "s3",
+        config=BotoConfig(
+            max_pool_connections=max(10, Config.COLLECTION_METADATA_CONCURRENCY)
+        ),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_lambda_client():
+    return boto3.client(
+        "lambda",
+        region_name="eu-west-2",
+        aws_access_key_id=Config.ACCESS_KEY_ID,
+        aws_secret_access_key=Config.SECRET_ACCESS_KEY,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_sqs_client():
+    return boto3.Session().client("sqs")
@@ -24,11 +24,71 @@ class Config:
     GOOGLE_ANALYTICS_SECRET_KEY = os.getenv("GOOGLE_ANALYTICS_SECRET_KEY")
     GOOGLE_ANALYTICS_CLIENT_ID = os.getenv("GOOGLE_ANALYTICS_CLIENT_ID")
     MIXPANEL_PROJECT_TOKEN = os.getenv("MIXPANEL_PROJECT_TOKEN")
+    ANALYTICS_SINK = os.getenv("ANALYTICS_SINK", "log")
+    ANALYTICS_QUEUE_URL = os.getenv("ANALYTICS_QUEUE_URL")
+    ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", 50))
+    ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", 5))
+    ANALYTICS_QUEUE_SIZE = int(os.getenv("ANALYTICS_QUEUE_SIZE", 1000))
     DB_HOST = os.getenv("DB_HOST")
     RDS_PASSWORD = os.getenv("DB_PASSWORD")
     RDS_USER = os.getenv("DB_USER")
     RDS_PORT = os.getenv("DB_PORT")
     DB_NAME = os.getenv("DB_NAME")
+    COLLECTION_PAGE_SIZE = int(os.getenv("COLLECTION_PAGE_SIZE", 10))
+    COLLECTION_MAX_PAGE_SIZE = int(os.getenv("COLLECTION_MAX_PAGE_SIZE", 100))
+    COLLECTION_METADATA_CONCURRENCY = int(
+        os.getenv("COLLECTION_METADATA_CONCURRENCY", 16)
+    )
+    COLLECTION_COUNT_TTL = float(os.getenv("COLLECTION_COUNT_TTL", 300))
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 10))
+    RERUN_CONCURRENCY = int(os.getenv("RERUN_CONCURRENCY", 100))
+    RERUN_ITEM_TIMEOUT = float(os.getenv("RERUN_ITEM_TIMEOUT", 600))
+    RERUN_CHECKPOINT = os.getenv("RERUN_CHECKPOINT", "text-metadata-checkpoint.json")
+    CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", 30))
+    PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", 30))
+    ISSUER_DOMAIN_TTL = float(os.getenv("ISSUER_DOMAIN_TTL", 3600))
+    ISSUER_DOMAIN_NEGATIVE_TTL = float(os.getenv("ISSUER_DOMAIN_NEGATIVE_TTL", 300))
+    ISSUER_DOMAIN_CACHE_PATH = os.getenv("ISSUER_DOMAIN_CACHE_PATH")
+    # A JSON list of rules, a JSON file path, or an s3://bucket/key object.
+    DOMAIN_RESOLVER_RULES = os.getenv("DOMAIN_RESOLVER_RULES")
+    S3_WRITE_CONCURRENCY = int(os.getenv("S3_WRITE_CONCURRENCY", 8))
+    S3_MULTIPART_PART_SIZE = int(os.getenv("S3_MULTIPART_PART_SIZE", 8 * 2**20))
+    FETCH_CONNECTION_LIMIT = int(os.getenv("FETCH_CONNECTION_LIMIT", 100))
+    FETCH_CONNECTION_LIMIT_PER_HOST = int(
+        os.getenv("FETCH_CONNECTION_LIMIT_PER_HOST", 20)
+    )
+    FETCH_DNS_CACHE_TTL = int(os.getenv("FETCH_DNS_CACHE_TTL", 300))
+    FETCH_KEEPALIVE_TIMEOUT = float(os.getenv("FETCH_KEEPALIVE_TIMEOUT", 30))
+    FETCH_FAILURE_BACKOFF = float(os.getenv("FETCH_FAILURE_BACKOFF", 5))
+    FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", 512 * 2**20))
+    FETCH_STREAM_CHUNK_SIZE = int(os.getenv("FETCH_STREAM_CHUNK_SIZE", 2**20))
+    IPFS_GATEWAY_TIMEOUT = float(os.getenv("IPFS_GATEWAY_TIMEOUT", 30))
+    IPFS_HEDGE_DELAY = float(os.getenv("IPFS_HEDGE_DELAY", 2))
+    IPFS_GATEWAY_STATS_PATH = os.getenv("IPFS_GATEWAY_STATS_PATH")
+    IPFS_CACHE_MEMORY_BYTES = int(os.getenv("IPFS_CACHE_MEMORY_BYTES", 64 * 2**20))
+    IPFS_CACHE_MAX_ITEM_BYTES = int(os.getenv("IPFS_CACHE_MAX_ITEM_BYTES", 8 * 2**20))
+    IPFS_CACHE_DIR = os.getenv("IPFS_CACHE_DIR")
+    IPFS_CACHE_DISK_BYTES = int(os.getenv("IPFS_CACHE_DISK_BYTES", 512 * 2**20))
+    IMAGE_EXECUTOR = os.getenv("IMAGE_EXECUTOR", "thread")
+    IMAGE_EXECUTOR_WORKERS = int(
+        os.getenv("IMAGE_EXECUTOR_WORKERS", min(4, os.cpu_count() or 1))
+    )
+    IMAGE_EXECUTOR_QUEUE_SIZE = int(os.getenv("IMAGE_EXECUTOR_QUEUE_SIZE", 16))
+    IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", 64_000_000))
+    IMAGE_RESAMPLE = os.getenv("IMAGE_RESAMPLE", "bicubic")
+    IMAGE_REDUCING_GAP = float(os.getenv("IMAGE_REDUCING_GAP", 2.0))
+    # Heights of the PNG renditions made at ingest; 200px is the thumbnail.
+    IMAGE_RENDITIONS = sorted(
+        {200}
+        | {
+            int(size)
+            for size in os.getenv("IMAGE_RENDITIONS", "64,400,800").split(",")
+            if size.strip()
+        }
+    )
+    RESIZED_IMAGE_CACHE_BYTES = int(os.getenv("RESIZED_IMAGE_CACHE_BYTES", 32 * 2**20))
+    MANIFEST_CACHE_BYTES = int(os.getenv("MANIFEST_CACHE_BYTES", 4 * 2**20))
+    MANIFEST_CACHE_TTL = float(os.getenv("MANIFEST_CACHE_TTL", 300))
     IPFS_HOSTS = [
         "https://nftstorage.link/ipfs",
         "https://gateway.pinata.cloud/ipfs",
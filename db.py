@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+import logging
+import time
+
+from config import Config
+
+logger = logging.getLogger("app_log")
+
+
+def connect_postgres():
+    import psycopg2
+
+    connection = psycopg2.connect(
+        user=Config.RDS_USER,
+        password=Config.RDS_PASSWORD,
+        host=Config.DB_HOST,
+        port=Config.RDS_PORT,
+        database=Config.DB_NAME,
+    )
+    # Read-only queries; autocommit keeps a reused connection from sitting
+    # idle in a transaction between invocations.
+    connection.autocommit = True
+    return connection
+
+
+def postgres_reconnect_errors() -> Tuple:
+    import psycopg2
+
+    return psycopg2.OperationalError, psycopg2.InterfaceError
+
+
+class ProjectTrackerRepository:
+    """Parameterized queries against `project_tracker` over one reused connection.
+
+    `placeholder` is the DB-API paramstyle marker: `%s` for psycopg2, `?` for
+    sqlite3. On one of `reconnect_errors` the connection is reopened and the
+    query retried once. Collection counts are kept for `count_ttl` seconds,
+    at most `max_counts` of them, least recently used dropped first.
+    """
+
+    def __init__(
+        self,
+        connect: Callable,
+        placeholder: str = "%s",
+        reconnect_errors: Tuple = (),
+        count_ttl: Optional[float] = None,
+        max_counts: int = 10000,
+    ):
+        self.connect = connect
+        self.placeholder = placeholder
+        self.reconnect_errors = reconnect_errors
+        self.count_ttl = Config.COLLECTION_COUNT_TTL if count_ttl is None else count_ttl
+        self.max_counts = max_counts
+        self._connection = None
+        self._counts: "OrderedDict[Tuple[str, int], Tuple[float, int]]" = OrderedDict()
+
+    @property
+    def connection(self):
+        if self._connection is None or getattr(self._connection, "closed", False):
+            self._connection = self.connect()
+        return self._connection
+
+    def _close_connection(self):
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            connection.close()
+        except Exception as e:
+            logger.info(f"Could not close the database connection: {e}")
+
+    def _fetchall(self, query: str, params: Tuple) -> List[Tuple]:
+        query = query.replace("%s", self.placeholder)
+        for attempt in range(2):
+            try:
+                cursor = self.connection.cursor()
+                try:
+                    cursor.execute(query, params)
+                    return cursor.fetchall()
+                finally:
+                    cursor.close()
+            except self.reconnect_errors as e:
+                if attempt:
+                    raise
+                logger.info(f"Reconnecting to the database after: {e}")
+                self._close_connection()
+
+    def fetch_token_ids_after(
+        self, issuer: str, taxon: int, limit: int, after: Optional[str] = None
+    ) -> List[str]:
+        """Keyset pagination: the `limit` token ids that sort after `after`."""
+        if after is None:
+            rows = self._fetchall(
+                "SELECT nft_token_id FROM project_tracker "
+                "WHERE issuer = %s AND taxon = %s "
+                "ORDER BY nft_token_id LIMIT %s",
+                (issuer, taxon, limit),
+            )
+        else:
+            rows = self._fetchall(
+                "SELECT nft_token_id FROM project_tracker "
+                "WHERE issuer = %s AND taxon = %s AND nft_token_id > %s "
+                "ORDER BY nft_token_id LIMIT %s",
+                (issuer, taxon, after, limit),
+            )
+        return [row[0] for row in rows]
+
+    def fetch_token_ids_page(
+        self, issuer: str, taxon: int, limit: int, page: int
+    ) -> List[str]:
+        """Numbered pages with OFFSET; the cost grows with the page number."""
+        rows = self._fetchall(
+            "SELECT nft_token_id FROM project_tracker "
+            "WHERE issuer = %s AND taxon = %s "
+            "ORDER BY nft_token_id LIMIT %s OFFSET %s",
+            (issuer, taxon, limit, (page - 1) * limit),
+        )
+        return [row[0] for row in rows]
+
+    def count(self, issuer: str, taxon: int) -> int:
+        """Token count for a collection, cached for `count_ttl` seconds."""
+        key = (issuer, taxon)
+        cached = self._counts.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self._counts.move_to_end(key)
+                return cached[1]
+            del self._counts[key]
+        rows = self._fetchall(
+            "SELECT COUNT(nft_token_id) FROM project_tracker "
+            "WHERE issuer = %s AND taxon = %s",
+            (issuer, taxon),
+        )
+        total = rows[0][0]
+        self._counts[key] = (time.monotonic() + self.count_ttl, total)
+        while len(self._counts) > self.max_counts:
+            self._counts.popitem(last=False)
+        return total
+
+
+_project_tracker: Optional[ProjectTrackerRepository] = None
+
+
+def get_project_tracker() -> ProjectTrackerRepository:
+    """Repository shared by every invocation of a warm Lambda."""
+    global _project_tracker
+    if _project_tracker is None:
+        _project_tracker = ProjectTrackerRepository(
+            connect_postgres, reconnect_errors=postgres_reconnect_errors()
+        )
+    return _project_tracker
@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import time
+
+from config import Config
+
+logger = logging.getLogger("app_log")
+
+# (expires_at, domain); a domain of None records an issuer without one.
+DomainEntry = Tuple[float, Optional[str]]
+
+
+class IssuerDomainCache:
+    """Issuer account -> decoded `Domain`, so each issuer is looked up once.
+
+    Found domains are kept for `ttl` seconds, and issuers without a domain
+    for `negative_ttl`; a lookup that raises is not cached. Concurrent
+    lookups of the same issuer share one request. Expiry uses wall-clock
+    time so a saved cache stays valid across runs.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None,
+        max_entries: int = 10000,
+    ):
+        self.ttl = ttl if ttl is not None else Config.ISSUER_DOMAIN_TTL
+        self.negative_ttl = (
+            negative_ttl
+            if negative_ttl is not None
+            else Config.ISSUER_DOMAIN_NEGATIVE_TTL
+        )
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, DomainEntry]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Task]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_cached(self, issuer: str) -> Tuple[bool, Optional[str]]:
+        """(hit, domain); a hit with a None domain is a cached miss."""
+        entry = self._entries.get(issuer)
+        if entry is None:
+            return False, None
+        expires_at, domain = entry
+        if expires_at <= time.time():
+            del self._entries[issuer]
+            return False, None
+        self._entries.move_to_end(issuer)
+        return True, domain
+
+    def put(self, issuer: str, domain: Optional[str]):
+        ttl = self.ttl if domain is not None else self.negative_ttl
+        self._entries[issuer] = (time.time() + ttl, domain)
+        self._entries.move_to_end(issuer)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _lookup(
+        self, issuer: str, lookup: Callable[[str], Awaitable[Optional[str]]]
+    ) -> Optional[str]:
+        # Raises on a failed request, so only an answer from the ledger is kept.
+        domain = await lookup(issuer)
+        self.put(issuer, domain)
+        return domain
+
+    async def get(
+        self, issuer: str, lookup: Callable[[str], Awaitable[Optional[str]]]
+    ) -> Optional[str]:
+        hit, domain = self.get_cached(issuer)
+        if hit:
+            return domain
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight.get(issuer)
+        # A task left over from an earlier event loop cannot be awaited here.
+        if inflight is None or inflight[0] is not loop:
+            task = asyncio.ensure_future(self._lookup(issuer, lookup))
+            self._inflight[issuer] = (loop, task)
+            task.add_done_callback(lambda _task: self._inflight.pop(issuer, None))
+        else:
+            task = inflight[1]
+        return await asyncio.shield(task)
+
+    def save(self, path: str):
+        now = time.time()
+        data = {
+            issuer: entry for issuer, entry in self._entries.items() if entry[0] > now
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load Issuer Domains from {path}. Error: {e}")
+            return
+        now = time.time()
+        for issuer, (expires_at, domain) in data.items():
+            if expires_at > now:
+                self._entries[issuer] = (expires_at, domain)
+
+
+issuer_domain_cache = IssuerDomainCache()
+if Config.ISSUER_DOMAIN_CACHE_PATH:
+    issuer_domain_cache.load(Config.ISSUER_DOMAIN_CACHE_PATH)
@@ -0,0 +1,207 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+import json
+import logging
+import re
+import string
+
+from config import Config
+
+logger = logging.getLogger("app_log")
+
+# The domains DomainURIExtractor always knew about. Rules from config are
+# checked before these, whatever their match type.
+DEFAULT_RULES = [
+    {
+        "match": "exact",
+        "pattern": "https://default-example.com",
+        "template": "{domain}/.well-known/xrpl-nft/{token_id}",
+    },
+    {
+        "match": "exact",
+        "pattern": "https://marketplace-api.onxrp.com/api/metadata/",
+        "template": "{domain}{token_id}.json",
+    },
+    {"match": "prefix", "pattern": "ipfs://", "template": "{domain}{token_id}.json"},
+]
+
+
+_formatter = string.Formatter()
+
+
+@dataclass
+class ResolverRule:
+    match: str
+    pattern: str
+    template: str
+
+    def bind(self, domain: str, **groups) -> str:
+        """The template with all but `token_id` filled in, as a %-format string.
+
+        `bound % {"token_id": token_id}` is several times faster than
+        `str.format` with keyword arguments.
+        """
+        values = {"domain": domain, **groups}
+        pieces = []
+        for literal, field, spec, conversion in _formatter.parse(self.template):
+            pieces.append(literal.replace("%", "%%"))
+            if field is None:
+                continue
+            if field == "token_id":
+                if spec or conversion:
+                    raise ValueError("{token_id} takes no format spec or conversion")
+                pieces.append("%(token_id)s")
+                continue
+            value = _formatter.convert_field(values[field], conversion)
+            pieces.append(_formatter.format_field(value, spec).replace("%", "%%"))
+        return "".join(pieces)
+
+    def render(self, domain: str, token_id: str, **groups) -> str:
+        return self.bind(domain, **groups) % {"token_id": token_id}
+
+
+class RuleTier:
+    """One set of rules: exact, then longest prefix, then regex.
+
+    `exact` rules are a dict lookup. `prefix` rules are compiled into one
+    alternation, longest prefix first. `regex` rules are tried in order and
+    their named groups are available to the template.
+    """
+
+    def __init__(self, rules: Iterable[Dict] = ()):
+        self.exact: Dict[str, ResolverRule] = {}
+        self.prefixes: Dict[str, ResolverRule] = {}
+        self.regexes: List[Tuple[Pattern, ResolverRule]] = []
+        self._prefix_pattern: Optional[Pattern] = None
+        for rule in rules:
+            self._add(rule["match"], rule["pattern"], rule["template"])
+        self._compile()
+
+    def __len__(self):
+        return len(self.exact) + len(self.prefixes) + len(self.regexes)
+
+    def _add(self, match: str, pattern: str, template: str):
+        rule = ResolverRule(match, pattern, template)
+        groups = {}
+        if match == "exact":
+            self.exact.setdefault(pattern, rule)
+        elif match == "prefix":
+            self.prefixes.setdefault(pattern, rule)
+        elif match == "regex":
+            regex = re.compile(pattern)
+            groups = dict.fromkeys(regex.groupindex, "")
+            self.regexes.append((regex, rule))
+        else:
+            raise ValueError(f"Unknown domain rule match type: {match}")
+        # Raises now for a placeholder the rule can never fill.
+        rule.bind("", **groups)
+
+    def _compile(self):
+        self._prefix_pattern = (
+            re.compile(
+                "|".join(
+                    re.escape(prefix)
+                    for prefix in sorted(self.prefixes, key=len, reverse=True)
+                )
+            )
+            if self.prefixes
+            else None
+        )
+
+    def add(self, match: str, pattern: str, template: str):
+        self._add(match, pattern, template)
+        self._compile()
+
+    def bind(self, domain: str) -> Optional[str]:
+        rule = self.exact.get(domain)
+        if rule is not None:
+            return rule.bind(domain)
+        if self._prefix_pattern is not None:
+            matched = self._prefix_pattern.match(domain)
+            if matched is not None:
+                return self.prefixes[matched.group(0)].bind(domain)
+        for regex, rule in self.regexes:
+            matched = regex.match(domain)
+            if matched is not None:
+                return rule.bind(domain, **matched.groupdict())
+        return None
+
+
+class DomainResolver:
+    """Maps an issuer Domain to a token URI through data-driven rules.
+
+    `rules` are checked as a whole before `defaults`, so a configured rule of
+    any match type overrides a default one. Templates are `str.format`
+    strings over `domain`, `token_id` and a regex rule's named groups.
+
+    Every token of an issuer shares its Domain, so the template bound to a
+    domain is remembered and later tokens only substitute their token id.
+    """
+
+    def __init__(
+        self,
+        rules: Iterable[Dict],
+        defaults: Iterable[Dict] = (),
+        max_bound: int = 4096,
+    ):
+        self.tiers = [RuleTier(rules), RuleTier(defaults)]
+        self.max_bound = max_bound
+        self._bound: Dict[str, Optional[str]] = {}
+
+    def __len__(self):
+        return sum(len(tier) for tier in self.tiers)
+
+    def add(self, match: str, pattern: str, template: str):
+        """Add a rule ahead of the defaults."""
+        self.tiers[0].add(match, pattern, template)
+        self._bound.clear()
+
+    def _bind(self, domain: str) -> Optional[str]:
+        for tier in self.tiers:
+            bound = tier.bind(domain)
+            if bound is not None:
+                return bound
+        return None
+
+    def resolve(self, domain: Optional[str], token_id: str) -> Optional[str]:
+        if domain is None:
+            return None
+        try:
+            bound = self._bound[domain]
+        except KeyError:
+            bound = self._bind(domain)
+            if len(self._bound) >= self.max_bound:
+                self._bound.clear()
+            self._bound[domain] = bound
+        if bound is None:
+            return None
+        return bound % {"token_id": token_id}
+
+
+def load_rules(source: Optional[str]) -> List[Dict]:
+    """Rules from a JSON list, a JSON file path or an `s3://bucket/key` object."""
+    if not source:
+        return []
+    try:
+        if source.lstrip().startswith("["):
+            rules = json.loads(source)
+        elif source.startswith("s3://"):
+            from clients import get_s3_client
+
+            bucket, key = source.replace("s3://", "").split("/", 1)
+            body = get_s3_client().get_object(Bucket=bucket, Key=key)["Body"]
+            rules = json.load(body)
+        else:
+            with open(source, "r") as f:
+                rules = json.load(f)
+        # Fail here, with a log line, rather than on every mint.
+        RuleTier(rules)
+    except Exception as e:  # noqa
+        logger.error(f"Could not load domain rules from {source}. Error: {e!r}")
+        return []
+    return rules
+
+
+domain_resolver = DomainResolver(
+    load_rules(Config.DOMAIN_RESOLVER_RULES), DEFAULT_RULES
+)
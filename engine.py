@@ -1,73 +1,185 @@
 import json
 import logging
-from typing import List
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
 import asyncio
 import traceback
 from abc import ABCMeta, abstractmethod
 from PIL import UnidentifiedImageError
 
 from writers import AsyncS3FileWriter, Config
-from utils import delete_from_s3, read_json, chunks
+from utils import (
+    delete_from_s3,
+    in_shard,
+    ledger_transactions,
+    nftoken_issuer,
+    read_json,
+)
 from fetcher import Fetcher
-from image_processor import process_image
-from extractors import TokenIDExtractor, TokenURIExtractor, DomainURIExtractor
-from exceptions import NoMetaDataException, EngineException
+from domain_cache import issuer_domain_cache
+from image_processor import image_pool, render_image
+from scheduler import SchedulerStats, WorkScheduler, aiterate
+from checkpoint import CheckpointTracker
+from extractors import (
+    TokenIDExtractor,
+    TokenURIExtractor,
+    DomainURIExtractor,
+    InvalidTxnResultException,
+)
+from exceptions import (
+    EngineException,
+    FetchTooLargeException,
+    ImageTooLargeException,
+    NoMetaDataException,
+)
 
 logger = logging.getLogger("app_log")
 
 
 class BaseAssetExtractionEngine(metaclass=ABCMeta):
-    def __init__(self, data):
+    def __init__(
+        self,
+        data,
+        fetcher: Optional[Fetcher] = None,
+        writer: Optional[AsyncS3FileWriter] = None,
+    ):
         self.data = data
-        self.writer = AsyncS3FileWriter()
-        self.fetcher = Fetcher()
+        self.image_pool = image_pool
+        self.writer = writer or AsyncS3FileWriter(image_pool=self.image_pool)
+        self.fetcher = fetcher or Fetcher()
         self.token_id_extractor = TokenIDExtractor(data)
         self.token_uri_extractor = TokenURIExtractor(data)
+        self._manifests: Dict[str, Dict] = {}
+
+    def _record_asset(
+        self, token_id: str, asset_type: str, key: str, content_type: str, size: int
+    ):
+        assets = self._manifests.setdefault(token_id, {})
+        assets[asset_type] = {"key": key, "content_type": content_type, "size": size}
+        return assets[asset_type]
+
+    async def _dump_manifest(self, token_id: str):
+        assets = self._manifests.pop(token_id, None)
+        if assets:
+            await self.writer.write_json(
+                f"assets/manifests/{token_id}/manifest.json",
+                {"token_id": token_id, "assets": assets},
+            )
 
     async def _dump_image(self, content: bytes, token_id: str, content_type):
-        full, resized = process_image(content)
+        try:
+            full_content, renditions = await self.image_pool.run(
+                render_image, content, content_type
+            )
+        except ImageTooLargeException as e:
+            # Keep the original; resize requests fall back to it.
+            logger.error(f"Storing Image for {token_id} without renditions: {e}")
+            full_content, renditions = content, {}
         ext = content_type.split("/")[1]
-        await self.writer.write_image(
-            f"assets/images/{token_id}/200px/image", resized, "image/png"
-        )
-        await self.writer.write_image(
-            f"assets/images/{token_id}/200px/image.png", resized, "image/png"
-        )
-        await self.writer.write_image(
-            f"assets/images/{token_id}/full/image", full, content_type
-        )
-        await self.writer.write_image(
-            f"assets/images/{token_id}/full/image.{ext}", full, content_type
+        full_key = f"assets/images/{token_id}/full/image"
+        items = [
+            (full_key, full_content, content_type),
+            (f"{full_key}.{ext}", full_content, content_type),
+        ]
+        image = self._record_asset(
+            token_id, "image", full_key, content_type, len(full_content)
         )
+        image["renditions"] = []
+        for (width, height), rendition_content in renditions.items():
+            key = f"assets/images/{token_id}/{height}px/image"
+            items.extend(
+                [
+                    (key, rendition_content, "image/png"),
+                    (f"{key}.png", rendition_content, "image/png"),
+                ]
+            )
+            image["renditions"].append(
+                {
+                    "key": key,
+                    "content_type": "image/png",
+                    "size": len(rendition_content),
+                    "width": width,
+                    "height": height,
+                }
+            )
+            if height == 200:
+                self._record_asset(
+                    token_id, "thumbnail", key, "image/png", len(rendition_content)
+                )
+        await self.writer.write_many(items)
 
     async def _dump_metadata(self, data, token_id):
-        await self.writer.write_json(f"assets/metadata/{token_id}/metadata", data)
-        await self.writer.write_json(f"assets/metadata/{token_id}/metadata.json", data)
+        content = json.dumps(data, indent=4).encode("utf-8")
+        self._record_asset(
+            token_id,
+            "metadata",
+            f"assets/metadata/{token_id}/metadata",
+            "application/json",
+            len(content),
+        )
+        await self.writer.write_many(
+            [
+                (f"assets/metadata/{token_id}/metadata", content, "application/json"),
+                (
+                    f"assets/metadata/{token_id}/metadata.json",
+                    content,
+                    "application/json",
+                ),
+            ]
+        )
 
     async def _dump_file(self, file_type, token_id, content, content_type, extension):
-        await self.writer.write_media(
-            f"assets/{file_type}s/{token_id}/{file_type}", content, content_type
-        )
-        await self.writer.write_media(
-            f"assets/{file_type}s/{token_id}/{file_type}.{extension}",
-            content,
+        self._record_asset(
+            token_id,
+            file_type,
+            f"assets/{file_type}s/{token_id}/{file_type}",
             content_type,
+            len(content),
+        )
+        await self.writer.write_many(
+            [
+                (
+                    f"assets/{file_type}s/{token_id}/{file_type}",
+                    content,
+                    content_type,
+                ),
+                (
+                    f"assets/{file_type}s/{token_id}/{file_type}.{extension}",
+                    content,
+                    content_type,
+                ),
+            ]
         )
 
     async def _process_image_metadata(
         self, token_uri: str, token_id: str, content: bytes, content_type: str
     ):
         meta_data = {"image": token_uri}
-        await self._dump_metadata(meta_data, token_id)
         logger.info("Processing possible image metadata")
-        await self._dump_image(content, token_id, content_type)
+        await asyncio.gather(
+            self._dump_metadata(meta_data, token_id),
+            self._dump_image(content, token_id, content_type),
+        )
 
     async def _process_json_metadata(self, metadata: dict, token_id: str):
         metadata_content = metadata.get("content")
         if metadata_content:
-            content, content_type = await self.fetcher.fetch(
-                metadata_content.replace("cid:", "")
-            )
+            try:
+                content, content_type = await self.fetcher.fetch(
+                    metadata_content.replace("cid:", "")
+                )
+            except FetchTooLargeException as e:
+                logger.error(f"Skipping content for {token_id}. Error: {e}")
+                metadata_content = None
+        if metadata_content:
             file_type = content_type.split("/")[0]
             if file_type == "image":
                 await self._dump_image(content, token_id, content_type)
@@ -87,13 +199,19 @@ class BaseAssetExtractionEngine(metaclass=ABCMeta):
         logger.info(f"Got FileType {file_type} For Metadata")
         meta_data = {file_type: token_uri}
         ext = content_type.split("/")[1]
-        await self._dump_metadata(meta_data, token_id)
-        await self._dump_file(file_type, token_id, content, content_type, ext)
+        await asyncio.gather(
+            self._dump_metadata(meta_data, token_id),
+            self._dump_file(file_type, token_id, content, content_type, ext),
+        )
 
     async def _extract_image_from_metadata(self, meta_data: dict, token_id: str):
         image_url = meta_data.get("image", meta_data.get("image_url"))
         if image_url:
-            image_content, content_type = await self.fetcher.fetch(image_url)
+            try:
+                image_content, content_type = await self.fetcher.fetch(image_url)
+            except FetchTooLargeException as e:
+                logger.error(f"Skipping Image for {token_id}. Error: {e}")
+                return
             if image_content is not None:
                 try:
                     await self._dump_image(image_content, token_id, content_type)
@@ -102,30 +220,43 @@ class BaseAssetExtractionEngine(metaclass=ABCMeta):
                         f"Could not dump Image with content-type: {content_type}. Error: {e}"
                     )
 
+    async def _stream_file(self, file_type, token_id, url):
+        path = f"assets/{file_type}s/{token_id}/{file_type}"
+        try:
+            async with self.fetcher.stream(url) as response:
+                if response is None:
+                    return
+                content_type = response.content_type
+                size = await self.writer.write_stream(path, response, content_type)
+        except FetchTooLargeException as e:
+            # Only this asset is skipped; the multipart upload was aborted.
+            logger.error(f"Skipping {file_type} for {token_id}. Error: {e}")
+            return
+        ext = content_type.split("/")[1]
+        await self.writer.copy(path, f"{path}.{ext}", content_type)
+        self._record_asset(token_id, file_type, path, content_type, size)
+
     async def _extract_video_from_metadata(self, meta_data: dict, token_id: str):
         video_url = meta_data.get("video", meta_data.get("video_url"))
         if video_url:  # noqa
-            video_content, content_type = await self.fetcher.fetch(video_url)
-            ext = content_type.split("/")[1]
-            if video_content:
-                await self._dump_file(
-                    "video", token_id, video_content, content_type, ext
-                )
+            await self._stream_file("video", token_id, video_url)
 
     async def _extract_animation_from_metadata(self, meta_data: dict, token_id: str):
         animation_url = meta_data.get("animation", meta_data.get("animation_url"))
         if animation_url:
-            animation_content, content_type = await self.fetcher.fetch(animation_url)
-            ext = content_type.split("/")[1]
-            if animation_content:
-                await self._dump_file(
-                    "animation", token_id, animation_content, content_type, ext
-                )
+            await self._stream_file("animation", token_id, animation_url)
 
     async def _extract_assets(self, token_id, token_uri):
+        try:
+            await self._extract_token_assets(token_id, token_uri)
+            await self._dump_manifest(token_id)
+        finally:
+            self._manifests.pop(token_id, None)
+
+    async def _extract_token_assets(self, token_id, token_uri):
         if token_uri is None:
             logger.info(
-                f"No Token URI Found For Object With ID: {self.data['ledger_index']}"
+                f"No Token URI Found For Object With ID: {self.data.get('ledger_index')}"
             )
             return
         content, content_type = await self.fetcher.fetch(token_uri)
@@ -157,68 +288,270 @@ class BaseAssetExtractionEngine(metaclass=ABCMeta):
     @abstractmethod
     async def _run(self): ...
 
+    async def _execute(self):
+        try:
+            async with self.writer:
+                try:
+                    await self._run()
+                finally:
+                    await self.fetcher.close()
+                    if Config.ISSUER_DOMAIN_CACHE_PATH:
+                        try:
+                            issuer_domain_cache.save(Config.ISSUER_DOMAIN_CACHE_PATH)
+                        except OSError as e:
+                            logger.error(f"Could not save Issuer Domains. Error: {e}")
+        finally:
+            # The writer encodes on the pool too, so this waits until it has
+            # flushed. Process workers would otherwise outlive the run; the
+            # pool is recreated on next use.
+            self.image_pool.shutdown()
+
     def run(self):
-        asyncio.run(self._run())
+        asyncio.run(self._execute())
 
 
 class AssetExtractionEngine(BaseAssetExtractionEngine):
+    async def _token_uri(self, token: Dict, single: bool) -> Optional[str]:
+        if "URI" in token:
+            return TokenURIExtractor(token).extract()
+        # A lone token's URI can also be on the transaction (NFTokenMint).
+        if single and "URI" in self.data:
+            return self.token_uri_extractor.extract()
+        # The transaction only has an `Issuer` when minting for another
+        # account; the NFTokenID always carries it.
+        return await DomainURIExtractor.async_extract(
+            {"Issuer": nftoken_issuer(token["NFTokenID"])},
+            token["NFTokenID"],
+            session=self.fetcher.session,
+        )
+
+    async def _extract_token(self, token: Dict, single: bool):
+        token_uri = await self._token_uri(token, single)
+        await self._extract_assets(token["NFTokenID"], token_uri)
+
     async def _run(self):
         logger.info(f"Running for transaction with hash -> {self.data['hash']}")
-        token_id = self.token_id_extractor.extract()
-        if token_id is None:
+        # NFTokens the transaction added; 0 when there was nothing to extract.
+        self.token_count = 0
+        try:
+            tokens = self.token_id_extractor.extract_tokens()
+        except KeyError as e:
+            # No `meta`/`metaData`, or a malformed page.
+            logger.error(f"Error getting nft-token-id: {e!r}")
+            tokens = []
+        if not tokens:
             logger.info(f"No Token ID For Transaction with hash: {self.data['hash']}")
             return
-        token_uri = None
-        if "URI" not in self.data:
-            token_uri = DomainURIExtractor.extract(self.data, token_id)
-        else:
-            token_uri = self.token_uri_extractor.extract()
-        await self._extract_assets(token_id, token_uri)
+        self.token_count = len(tokens)
+        if len(tokens) > 1:
+            logger.info(
+                f"Extracting {len(tokens)} NFTokens from transaction {self.data['hash']}"
+            )
+        # One token failing does not stop the others; the first error is
+        # raised once they have all finished.
+        results = await asyncio.gather(
+            *[self._extract_token(token, len(tokens) == 1) for token in tokens],
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        for token, result in zip(tokens, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    f"Error Extracting Assets for {token['NFTokenID']}. Error: {result}"
+                )
+        if errors:
+            raise errors[0]
+
+
+class BatchAssetExtractionEngine(BaseAssetExtractionEngine):
+    """Runs many NFTokenMint transactions through one fetcher and writer.
+
+    At most `concurrency` transactions are processed at once. `run` returns
+    one result per transaction, in input order, with status `success`,
+    `skipped` (no NFToken added) or `failed`, so failed items can be retried
+    on their own.
+    """
+
+    def __init__(self, transactions: Iterable[Dict], concurrency: Optional[int] = None):
+        super().__init__(data={"URI": ""})
+        self.transactions = list(transactions)
+        self.concurrency = concurrency or Config.BATCH_CONCURRENCY
+        self.results: List[Dict] = []
+
+    async def _process(self, index: int, transaction: Dict, semaphore):
+        async with semaphore:
+            result = {"index": index, "hash": transaction.get("hash")}
+            try:
+                engine = AssetExtractionEngine(
+                    transaction, fetcher=self.fetcher, writer=self.writer
+                )
+                await engine._run()
+                # No NFTokenID, or no metadata to find one in.
+                status = "success" if engine.token_count else "skipped"
+                return {**result, "status": status}
+            except Exception as e:
+                logger.error(
+                    f"Error Extracting Assets for transaction {result['hash']}. Error: {e}"
+                )
+                return {**result, "status": "failed", "error": str(e)}
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self.results = await asyncio.gather(
+            *[
+                self._process(index, transaction, semaphore)
+                for index, transaction in enumerate(self.transactions)
+            ]
+        )
+        failed = sum(1 for result in self.results if result["status"] == "failed")
+        skipped = sum(1 for result in self.results if result["status"] == "skipped")
+        logger.info(
+            f"Batch Completed: {len(self.results) - failed - skipped} succeeded, "
+            f"{skipped} skipped, {failed} failed"
+        )
+
+    def run(self) -> List[Dict]:
+        super().run()
+        return self.results
+
+
+class LedgerAssetExtractionEngine(BatchAssetExtractionEngine):
+    """Extracts every NFToken added in a ledger's worth of transactions.
+
+    Only successful transactions that add NFTokens are kept, whatever their
+    type, and they run through the batch engine.
+    """
+
+    def __init__(self, ledger, concurrency: Optional[int] = None):
+        transactions = [
+            transaction
+            for transaction in ledger_transactions(ledger)
+            if self._adds_tokens(transaction)
+        ]
+        super().__init__(transactions, concurrency=concurrency)
+
+    @staticmethod
+    def _adds_tokens(transaction: Dict) -> bool:
+        try:
+            return bool(TokenIDExtractor(transaction).extract_all())
+        except (InvalidTxnResultException, KeyError):
+            return False
 
 
 class TextMetadataRerunEngine(BaseAssetExtractionEngine):
-    def __init__(self, paths: List, data=None):
+    def __init__(
+        self,
+        paths: Union[Iterable[str], AsyncIterable[str]],
+        data=None,
+        concurrency: Optional[int] = None,
+        item_timeout: Optional[float] = None,
+        checkpoint: Optional[CheckpointTracker] = None,
+        shard_index: int = 0,
+        shard_count: int = 1,
+        on_progress: Optional[Callable[[SchedulerStats], None]] = None,
+    ):
         super().__init__(data=data if data is not None else {"URI": ""})
         self.paths = paths
+        self.concurrency = concurrency or Config.RERUN_CONCURRENCY
+        self.item_timeout = (
+            item_timeout if item_timeout is not None else Config.RERUN_ITEM_TIMEOUT
+        )
+        self.checkpoint = checkpoint
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.on_progress = on_progress
+        self.stats: Optional[SchedulerStats] = None
 
     async def __extract_metadata_and_assets(self, meta_data, token_id):
-        await self._process_json_metadata(meta_data, token_id)
+        try:
+            await self._process_json_metadata(meta_data, token_id)
 
-        # Extract image, video, and animation from metadata
-        await self._extract_image_from_metadata(meta_data, token_id)
-        await self._extract_video_from_metadata(meta_data, token_id)
-        await self._extract_animation_from_metadata(meta_data, token_id)
+            # Extract image, video, and animation from metadata
+            await self._extract_image_from_metadata(meta_data, token_id)
+            await self._extract_video_from_metadata(meta_data, token_id)
+            await self._extract_animation_from_metadata(meta_data, token_id)
+            await self._dump_manifest(token_id)
+        finally:
+            self._manifests.pop(token_id, None)
 
     async def _extract_metadata_and_assets(self, path):
         try:
             path_split = path.split("/")
             token_id = path_split[2]
-            metadata = await read_json(Config.DATA_DUMP_BUCKET, path, Config)
+            metadata = await read_json(
+                Config.DATA_DUMP_BUCKET, path, Config, s3=self.writer.client
+            )
             await self.__extract_metadata_and_assets(metadata, token_id)
-            await delete_from_s3(Config.DATA_DUMP_BUCKET, path, Config)
+            await delete_from_s3(
+                Config.DATA_DUMP_BUCKET, path, Config, s3=self.writer.client
+            )
         except json.JSONDecodeError:
-            await delete_from_s3(Config.DATA_DUMP_BUCKET, path, Config)
-        except Exception as e:
-            logger.error(f"Error Extracting Metadata and Asset for {path}. Error: {e}")
+            await delete_from_s3(
+                Config.DATA_DUMP_BUCKET, path, Config, s3=self.writer.client
+            )
+            return "deleted"
+
+    async def _dispatch(self) -> AsyncIterator[str]:
+        last_key = self.checkpoint.checkpoint.last_key if self.checkpoint else None
+        async for path in aiterate(self.paths):
+            if last_key is not None and path <= last_key:
+                continue
+            if not in_shard(path, self.shard_index, self.shard_count):
+                continue
+            if self.checkpoint is not None:
+                self.checkpoint.started(path)
+            yield path
+
+    async def _on_done(self, path, status, result):
+        if self.checkpoint is not None:
+            self.checkpoint.finished(path, result if result == "deleted" else status)
+            await self.checkpoint.maybe_save()
 
     async def _run(self):
-        for chunk in chunks(self.paths, 100):
-            await asyncio.gather(
-                *[self._extract_metadata_and_assets(path) for path in chunk]
-            )
+        # Errors and timeouts are logged and counted by the scheduler.
+        scheduler = WorkScheduler(
+            self._extract_metadata_and_assets,
+            concurrency=self.concurrency,
+            item_timeout=self.item_timeout,
+            name="Text Metadata Rerun",
+            on_done=self._on_done,
+            on_progress=self.on_progress,
+            progress_interval=Config.PROGRESS_INTERVAL,
+        )
+        try:
+            self.stats = await scheduler.run(self._dispatch())
+        finally:
+            if self.checkpoint is not None:
+                await self.checkpoint.save()
 
 
 class RetryEngine(BaseAssetExtractionEngine):
-    def __init__(self, data=None, path=None):
+    def __init__(
+        self,
+        data=None,
+        path=None,
+        fetcher: Optional[Fetcher] = None,
+        writer: Optional[AsyncS3FileWriter] = None,
+    ):
         if path is None and data is None:
             raise EngineException("Either path or data must be specified")
-        super().__init__(data={"URI": ""} if data is None else data)
+        super().__init__(
+            data={"URI": ""} if data is None else data, fetcher=fetcher, writer=writer
+        )
         self.path = path
 
+    @property
+    def failed_log_writer(self) -> AsyncS3FileWriter:
+        # Shares the open writer's client, so retries can run side by side on
+        # one writer.
+        return self.writer.for_bucket(Config.CACHE_FAILED_LOG_BUCKET)
+
     async def _run(self):
         logger.info(f"Started Retry for Path {self.path}")
         data = (
-            await read_json(Config.CACHE_FAILED_LOG_BUCKET, self.path, Config)
+            await read_json(
+                Config.CACHE_FAILED_LOG_BUCKET, self.path, Config, s3=self.writer.client
+            )
             if self.path is not None
             else self.data
         )
@@ -228,24 +561,30 @@ class RetryEngine(BaseAssetExtractionEngine):
         token_id = data.get("NFTokenID", "none")
         try:
             if not data.get("URI", ""):
-                token_uri = DomainURIExtractor.extract(data, token_id)
+                token_uri = await DomainURIExtractor.async_extract(
+                    data, token_id, session=self.fetcher.session
+                )
             else:
                 token_uri = self.token_uri_extractor.extract()
             await self._extract_assets(token_id, token_uri)
-            self.writer.bucket = Config.CACHE_FAILED_LOG_BUCKET
             await delete_from_s3(
-                Config.CACHE_FAILED_LOG_BUCKET, f"notfound/{token_id}.json", Config
+                Config.CACHE_FAILED_LOG_BUCKET,
+                f"notfound/{token_id}.json",
+                Config,
+                s3=self.writer.client,
             )
-            await self.writer.write_json(
+            await self.failed_log_writer.write_json(
                 f"done/{token_id}.json", {"URI": token_uri, "NFTokenID": token_id}
             )
         except Exception:  # noqa
             logger.error(traceback.format_exc())
-            self.writer.bucket = Config.CACHE_FAILED_LOG_BUCKET
             await delete_from_s3(
-                Config.CACHE_FAILED_LOG_BUCKET, f"notfound/{token_id}.json", Config
+                Config.CACHE_FAILED_LOG_BUCKET,
+                f"notfound/{token_id}.json",
+                Config,
+                s3=self.writer.client,
             )
-            await self.writer.write_json(
+            await self.failed_log_writer.write_json(
                 f"error/{token_id}.json",
                 {
                     "URI": self.data.get("URI"),
@@ -256,6 +595,50 @@ class RetryEngine(BaseAssetExtractionEngine):
             )
 
 
+class FailedObjectsRetryEngine(BaseAssetExtractionEngine):
+    """Retries every `notfound/` object, or this shard's share of them."""
+
+    def __init__(
+        self,
+        paths: Union[Iterable[str], AsyncIterable[str]],
+        concurrency: Optional[int] = None,
+        item_timeout: Optional[float] = None,
+        shard_index: int = 0,
+        shard_count: int = 1,
+        on_progress: Optional[Callable[[SchedulerStats], None]] = None,
+    ):
+        super().__init__(data={"URI": ""})
+        self.paths = paths
+        self.concurrency = concurrency or Config.RERUN_CONCURRENCY
+        self.item_timeout = (
+            item_timeout if item_timeout is not None else Config.RERUN_ITEM_TIMEOUT
+        )
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.on_progress = on_progress
+        self.stats: Optional[SchedulerStats] = None
+
+    async def _dispatch(self) -> AsyncIterator[str]:
+        async for path in aiterate(self.paths):
+            if in_shard(path, self.shard_index, self.shard_count):
+                yield path
+
+    async def _retry(self, path):
+        engine = RetryEngine(path=path, fetcher=self.fetcher, writer=self.writer)
+        await engine._run()
+
+    async def _run(self):
+        scheduler = WorkScheduler(
+            self._retry,
+            concurrency=self.concurrency,
+            item_timeout=self.item_timeout,
+            name="Failed Objects Retry",
+            on_progress=self.on_progress,
+            progress_interval=Config.PROGRESS_INTERVAL,
+        )
+        self.stats = await scheduler.run(self._dispatch())
+
+
 class PublicRetryEngine(BaseAssetExtractionEngine):
     def __init__(self, token_id, data=None):
         super().__init__(data={"URI": ""})
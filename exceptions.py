@@ -8,3 +8,15 @@ class DomainNotFoundException(Exception):
 
 class EngineException(Exception):
     pass
+
+
+class FetchTooLargeException(Exception):
+    pass
+
+
+class ImageTooLargeException(Exception):
+    pass
+
+
+class AccountInfoException(Exception):
+    pass
@@ -1,11 +1,14 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import logging
+import aiohttp
+from domain_cache import IssuerDomainCache, issuer_domain_cache
+from domain_resolver import domain_resolver
 from utils import (
     hex_to_text,
     is_ipfs,
     is_normal_url,
-    fetch_account_info,
-    fetch_account_info_async,
+    fetch_account_domain,
+    fetch_account_domain_async,
 )
 from abc import ABCMeta, abstractmethod
 
@@ -22,78 +25,91 @@ class BaseExtractor(metaclass=ABCMeta):
 
 
 class TokenIDExtractor(BaseExtractor):
+    """NFTokenIDs added to or removed from NFTokenPages by a transaction.
+
+    One pass over `AffectedNodes` collects the tokens on every page before
+    and after the transaction, keyed by NFTokenID, and the two are diffed.
+    Tokens that only moved between pages (a page split or merge) are in both
+    and cancel out.
+    """
+
     def __init__(self, data: Dict):
         self._data = data
 
+    @property
+    def _meta(self) -> Dict:
+        # Transactions from `tx`/`account_tx` carry `meta`, ledger dumps `metaData`.
+        return self._data.get("meta") or self._data["metaData"]
+
     @property
     def _affected_nodes(self):
-        return self._data["meta"]["AffectedNodes"]
-
-    def _get_token_page_modified_nodes(self) -> List[Dict]:
-        modified_nodes = [
-            node for node in self._affected_nodes if node.get("ModifiedNode", False)
-        ]
-        if modified_nodes:
-            return [
-                node
-                for node in modified_nodes
-                if node["ModifiedNode"]["LedgerEntryType"] == "NFTokenPage"
-            ]
-        return []
-
-    def _get_token_page_created_nodes(self) -> List[Dict]:
-        created_nodes = [
-            node for node in self._affected_nodes if node.get("CreatedNode", False)
-        ]
-        return [
-            node
-            for node in created_nodes
-            if node["CreatedNode"]["LedgerEntryType"] == "NFTokenPage"
-        ]
-
-    def _get_nft_tokens_from_modified_nodes(self) -> List[Dict]:
-        modified_nodes = self._get_token_page_modified_nodes()
-        result = []
-        for node in modified_nodes:
-            result.extend(node["ModifiedNode"]["FinalFields"]["NFTokens"])
-            if node["ModifiedNode"]["PreviousFields"].get("NFTokens"):
-                result.extend(node["ModifiedNode"]["PreviousFields"].get("NFTokens"))
-        return result
-
-    def _get_nft_tokens_from_created_nodes(self) -> List[Dict]:
-        created_nodes = self._get_token_page_created_nodes()
-        result = []
-        for node in created_nodes:
-            result.extend(node["CreatedNode"]["NewFields"]["NFTokens"])
-        return result
-
-    def _get_all_nft_tokens(self) -> List[Dict]:
-        modified_nodes_tokens = self._get_nft_tokens_from_modified_nodes()
-        created_nodes_tokens = self._get_nft_tokens_from_created_nodes()
-        return modified_nodes_tokens + created_nodes_tokens
+        return self._meta["AffectedNodes"]
+
+    def _diff(self) -> Tuple[Dict[str, Dict], Dict[str, None]]:
+        # Dicts rather than sets keep ledger order.
+        before: Dict[str, None] = {}
+        after: Dict[str, Dict] = {}
+        for node in self._affected_nodes:
+            if "ModifiedNode" in node:
+                page = node["ModifiedNode"]
+                if page.get("LedgerEntryType") != "NFTokenPage":
+                    continue
+                final = page.get("FinalFields", {}).get("NFTokens", [])
+                # No NFTokens in PreviousFields means the page's tokens did not change.
+                previous = page.get("PreviousFields", {}).get("NFTokens", final)
+            elif "CreatedNode" in node:
+                page = node["CreatedNode"]
+                if page.get("LedgerEntryType") != "NFTokenPage":
+                    continue
+                final = page.get("NewFields", {}).get("NFTokens", [])
+                previous = []
+            elif "DeletedNode" in node:
+                page = node["DeletedNode"]
+                if page.get("LedgerEntryType") != "NFTokenPage":
+                    continue
+                final = []
+                previous = page.get("FinalFields", {}).get("NFTokens", [])
+            else:
+                continue
+            for token in previous:
+                before[token["NFToken"]["NFTokenID"]] = None
+            for token in final:
+                after[token["NFToken"]["NFTokenID"]] = token["NFToken"]
+        return after, before
+
+    def _check_result(self):
+        if self._meta["TransactionResult"] != "tesSUCCESS":
+            raise InvalidTxnResultException("Invalid Transaction Result")
+
+    def diff(self) -> Tuple[List[str], List[str]]:
+        """(added, removed) NFTokenIDs, in ledger order."""
+        self._check_result()
+        after, before = self._diff()
+        added = [token_id for token_id in after if token_id not in before]
+        removed = [token_id for token_id in before if token_id not in after]
+        return added, removed
+
+    def extract_tokens(self) -> List[Dict]:
+        """The NFToken entries (NFTokenID and URI) added by the transaction."""
+        self._check_result()
+        after, before = self._diff()
+        return [token for token_id, token in after.items() if token_id not in before]
+
+    def extract_all(self) -> List[str]:
+        return [token["NFTokenID"] for token in self.extract_tokens()]
 
     def extract(self) -> Optional[str]:
-        if self._data["meta"]["TransactionResult"] != "tesSUCCESS":
-            raise InvalidTxnResultException("Invalid Transaction Result")
         try:
-            nft_tokens = self._get_all_nft_tokens()
-            hash_map = {}
-            for token in nft_tokens:
-                token_hash = hash(str(token))
-                if not hash_map.get(token_hash):
-                    hash_map[token_hash] = {"count": 1, "token": token}
-                else:
-                    hash_map[token_hash]["count"] += 1
-            target_tokens = [
-                item["token"] for item in hash_map.values() if item["count"] == 1
-            ]
-            if len(target_tokens) > 1:
-                logger.info("Multiple NFTokens Returned")
-                return None
-            return target_tokens[0]["NFToken"]["NFTokenID"]
+            token_ids = self.extract_all()
+        except InvalidTxnResultException:
+            raise
         except Exception as e:
             logger.error(f"Error getting nft-token-id: {e}")
-        return None
+            return None
+        if len(token_ids) > 1:
+            logger.info("Multiple NFTokens Returned")
+            return None
+        return token_ids[0] if token_ids else None
 
 
 class TokenURIExtractor(BaseExtractor):
@@ -112,39 +128,38 @@ class TokenURIExtractor(BaseExtractor):
 
 class DomainURIExtractor:
     @staticmethod
-    def extract(data, token_id):
+    def _build_uri(domain, token_id):
+        token_uri = domain_resolver.resolve(domain, token_id)
+        if token_uri is None:
+            logger.info(f"Unrecognized Domain --> {domain}")
+            raise ValueError(f"Unrecognized Domain --> {domain}")
+        return token_uri
+
+    @staticmethod
+    def extract(data, token_id, cache: IssuerDomainCache = issuer_domain_cache):
         domain = None
         if "Domain" in data:
             domain = data["Domain"]
         else:
-            account_data = fetch_account_info(data["Issuer"])
-            domain = hex_to_text(account_data["Domain"])
-
-        if domain == "https://default-example.com":
-            return f"{domain}/.well-known/xrpl-nft/{token_id}"
-        elif domain == "https://marketplace-api.onxrp.com/api/metadata/":
-            return f"{domain}{token_id}.json"
-        elif is_ipfs(domain):
-            return f"{domain}{token_id}.json"
-        else:
-            logger.info(f"Unrecognized Domain --> {domain}")
-            raise ValueError(f"Unrecognized Domain --> {domain}")
+            hit, domain = cache.get_cached(data["Issuer"])
+            if not hit:
+                domain = fetch_account_domain(data["Issuer"])
+                cache.put(data["Issuer"], domain)
+        return DomainURIExtractor._build_uri(domain, token_id)
 
     @staticmethod
-    async def async_extract(data, token_id):
+    async def async_extract(
+        data,
+        token_id,
+        session: Optional[aiohttp.ClientSession] = None,
+        cache: IssuerDomainCache = issuer_domain_cache,
+    ):
         domain = None
         if "Domain" in data:
             domain = data["Domain"]
         else:
-            account_data = await fetch_account_info_async(data["Issuer"])
-            domain = hex_to_text(account_data["Domain"])
-
-        if domain == "https://default-example.com":
-            return f"{domain}/.well-known/xrpl-nft/{token_id}"
-        elif domain == "https://marketplace-api.onxrp.com/api/metadata/":
-            return f"{domain}{token_id}.json"
-        elif is_ipfs(domain):
-            return f"{domain}{token_id}.json"
-        else:
-            logger.info(f"Unrecognized Domain --> {domain}")
-            raise ValueError
+            domain = await cache.get(
+                data["Issuer"],
+                lambda issuer: fetch_account_domain_async(issuer, session=session),
+            )
+        return DomainURIExtractor._build_uri(domain, token_id)
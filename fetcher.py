@@ -1,48 +1,283 @@
-from typing import Optional, Tuple
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 import aiohttp
 import asyncio
+import time
+from cache import ContentAddressedCache, ipfs_cache, normalize_cid_path
 from config import Config
+from exceptions import FetchTooLargeException
+from gateway_health import GatewayHealthTracker, gateway_tracker
 from utils import get_path_from_ipfs_url, is_normal_url
 import logging
 
 logger = logging.getLogger("app_log")
 
 
+class StreamedResponse:
+    def __init__(self, response: aiohttp.ClientResponse, url: str) -> None:
+        self.response = response
+        self.url = url
+        self.content_type = response.headers["Content-Type"]
+        self.content_length = response.content_length
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self._iter_chunks()
+
+    async def _iter_chunks(self) -> AsyncIterator[bytes]:
+        size = 0
+        async for chunk in self.response.content.iter_chunked(
+            Config.FETCH_STREAM_CHUNK_SIZE
+        ):
+            size += len(chunk)
+            if size > Config.FETCH_MAX_BYTES:
+                raise FetchTooLargeException(
+                    f"{self.url} is larger than {Config.FETCH_MAX_BYTES} bytes"
+                )
+            yield chunk
+
+
 class Fetcher:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        cache: Optional[ContentAddressedCache] = ipfs_cache,
+        tracker: GatewayHealthTracker = gateway_tracker,
+    ) -> None:
         self.ipfs_hosts = Config.IPFS_HOSTS
+        self.cache = cache
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.gateway_tracker = tracker
 
-    async def _fetch(self, url, headers={}) -> Tuple[Optional[bytes], Optional[str]]:  # noqa
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    content = await response.content.read()
-                    content_type = response.headers["Content-Type"]
-                    return content, content_type
-                logger.error(f"Fetch Failed for {url}")
-                await asyncio.sleep(5)
-                return None, None
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=Config.FETCH_CONNECTION_LIMIT,
+                limit_per_host=Config.FETCH_CONNECTION_LIMIT_PER_HOST,
+                ttl_dns_cache=Config.FETCH_DNS_CACHE_TTL,
+                keepalive_timeout=Config.FETCH_KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if Config.IPFS_GATEWAY_STATS_PATH:
+            try:
+                self.gateway_tracker.save(Config.IPFS_GATEWAY_STATS_PATH)
+            except OSError as e:
+                logger.error(f"Could not save IPFS Gateway stats. Error: {e}")
+        if self._session is not None:
+            session = self._session
+            self._session = None
+            await session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @staticmethod
+    def _check_content_length(response: aiohttp.ClientResponse, url: str):
+        if (
+            response.content_length is not None
+            and response.content_length > Config.FETCH_MAX_BYTES
+        ):
+            raise FetchTooLargeException(
+                f"{url} is {response.content_length} bytes, "
+                f"the limit is {Config.FETCH_MAX_BYTES}"
+            )
+
+    async def _get(
+        self, url, headers={}
+    ) -> Tuple[int, Optional[bytes], Optional[str]]:  # noqa
+        async with self.session.get(url, headers=headers) as response:
+            if response.status == 200:
+                self._check_content_length(response, url)
+                content = b"".join(
+                    [chunk async for chunk in StreamedResponse(response, url)]
+                )
+                content_type = response.headers["Content-Type"]
+                return response.status, content, content_type
+            logger.error(f"Fetch Failed for {url}")
+            return response.status, None, None
+
+    async def _open(
+        self, url, headers={}
+    ) -> Tuple[int, Optional[aiohttp.ClientResponse]]:  # noqa
+        response = await self.session.get(url, headers=headers)
+        if response.status != 200:
+            logger.error(f"Fetch Failed for {url}")
+            response.release()
+            return response.status, None
+        try:
+            self._check_content_length(response, url)
+        except FetchTooLargeException:
+            response.release()
+            raise
+        return response.status, response
+
+    async def _fetch(
+        self, url, headers={}
+    ) -> Tuple[Optional[bytes], Optional[str]]:  # noqa
+        _status, content, content_type = await self._get(url, headers)
+        return content, content_type
+
+    async def _from_ipfs(self, ipfs_hash: str, host: str, request):
+        url = f"{host}/{ipfs_hash}"
+        start = time.monotonic()
+        try:
+            status, result = await asyncio.wait_for(
+                request(url), timeout=Config.IPFS_GATEWAY_TIMEOUT
+            )
+        except FetchTooLargeException:
+            # Every gateway serves the same content, so stop the race.
+            raise
+        except Exception as e:  # noqa
+            # A timeout, connection error or bad response (e.g. no
+            # Content-Type) fails this gateway only.
+            logger.error(f"Fetch Failed for {url}. Error: {e!r}")
+            self.gateway_tracker.record(host, time.monotonic() - start, None)
+            return None
+        self.gateway_tracker.record(host, time.monotonic() - start, status)
+        return result
 
     async def _fetch_from_ipfs(
         self, ipfs_hash: str, host: str
-    ) -> Tuple[Optional[bytes], Optional[str]]:
-        response = await self._fetch(f"{host}/{ipfs_hash}")
-        return response
+    ) -> Optional[Tuple[bytes, str]]:
+        async def request(url):
+            status, content, content_type = await self._get(url)
+            return status, None if content is None else (content, content_type)
+
+        return await self._from_ipfs(ipfs_hash, host, request)
+
+    async def _open_from_ipfs(
+        self, ipfs_hash: str, host: str
+    ) -> Optional[aiohttp.ClientResponse]:
+        return await self._from_ipfs(ipfs_hash, host, self._open)
+
+    async def _hedge(
+        self,
+        hosts: List[str],
+        attempt: Callable[[str], Awaitable],
+        hedge_delay: float,
+        release: Optional[Callable] = None,
+    ):
+        """Race `attempt` over the gateways and return the first non-None result.
+
+        Gateways are tried in the given order. A new gateway is started
+        every `hedge_delay` seconds, or as soon as a running one fails; with no
+        delay every gateway starts at once. The attempts still running when a
+        winner is found are cancelled, and `release` is called on any extra
+        result that completed in the meantime.
+        """
+        hosts = list(hosts)
+        pending = set()
+        winner = None
+        try:
+            while hosts or pending:
+                if hosts:
+                    pending.add(asyncio.ensure_future(attempt(hosts.pop(0))))
+                    if hosts and hedge_delay <= 0:
+                        continue
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=hedge_delay if hosts else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    result = task.result()
+                    if result is None:
+                        continue
+                    if winner is None:
+                        winner = result
+                    elif release is not None:
+                        release(result)
+                if winner is not None:
+                    return winner
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+            results = await asyncio.gather(*pending, return_exceptions=True)
+            if release is not None:
+                for result in results:
+                    if result is not None and not isinstance(result, BaseException):
+                        release(result)
+
+    def _ranked_ipfs_hosts(self) -> Tuple[List[str], float]:
+        hosts = self.gateway_tracker.rank(self.ipfs_hosts)
+        hedge_delay = self.gateway_tracker.hedge_delay(
+            hosts[0], Config.IPFS_HEDGE_DELAY
+        )
+        return hosts, hedge_delay
 
     async def fetch(
         self, url: str, headers={}
     ) -> Tuple[Optional[bytes], Optional[str]]:  # noqa
         if is_normal_url(url):
             response = await self._fetch(url, headers)
+            if response[0] is None:
+                await asyncio.sleep(Config.FETCH_FAILURE_BACKOFF)
             return response
+        else:
+            return await self._fetch_ipfs_cached(get_path_from_ipfs_url(url))
+
+    @asynccontextmanager
+    async def stream(
+        self, url: str, headers={}
+    ) -> AsyncIterator[Optional[StreamedResponse]]:  # noqa
+        """Open `url` without buffering the body.
+
+        Yields a StreamedResponse to iterate over in chunks, or None if the
+        content could not be fetched. Bodies over FETCH_MAX_BYTES are rejected
+        from Content-Length up front, or while streaming otherwise.
+        """
+        if is_normal_url(url):
+            _status, response = await self._open(url, headers)
         else:
             ipfs_path = get_path_from_ipfs_url(url)
-            done, _ = await asyncio.wait(
-                [self._fetch_from_ipfs(ipfs_path, host) for host in self.ipfs_hosts],
-                return_when=asyncio.FIRST_COMPLETED,
+            hosts, hedge_delay = self._ranked_ipfs_hosts()
+            response = await self._hedge(
+                hosts,
+                lambda host: self._open_from_ipfs(ipfs_path, host),
+                hedge_delay,
+                release=lambda losing_response: losing_response.release(),
             )
-            result = None
-            for task in done:
-                if task.result() is not None:
-                    result = task.result()
-            return result
+        if response is None:
+            yield None
+            return
+        try:
+            yield StreamedResponse(response, url)
+        finally:
+            response.release()
+
+    async def _fetch_ipfs_uncached(
+        self, ipfs_path: str
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        hosts, hedge_delay = self._ranked_ipfs_hosts()
+        result = await self._hedge(
+            hosts, lambda host: self._fetch_from_ipfs(ipfs_path, host), hedge_delay
+        )
+        if result is None:
+            return None, None
+        content, content_type = result
+        if self.cache is not None:
+            await self.cache.put(normalize_cid_path(ipfs_path), content, content_type)
+        return content, content_type
+
+    async def _fetch_ipfs_cached(
+        self, ipfs_path: str
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        key = normalize_cid_path(ipfs_path)
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+        # Tokens of one collection often share a CID: join the running download.
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_ipfs_uncached(ipfs_path))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _task: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
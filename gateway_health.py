@@ -0,0 +1,215 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import time
+
+from config import Config
+
+logger = logging.getLogger("app_log")
+
+
+@dataclass
+class GatewayStats:
+    samples: Deque[Tuple[float, float]] = field(default_factory=deque)
+    requests: float = 0.0
+    errors: float = 0.0
+    throttled: float = 0.0
+    server_errors: float = 0.0
+    updated_at: float = 0.0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "samples": list(self.samples),
+            "requests": self.requests,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "server_errors": self.server_errors,
+            "updated_at": self.updated_at,
+            "consecutive_failures": self.consecutive_failures,
+            "ejected_until": self.ejected_until,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, max_samples: int) -> "GatewayStats":
+        samples = deque(
+            [tuple(sample) for sample in data.get("samples", [])], maxlen=max_samples
+        )
+        return cls(
+            samples=samples,
+            requests=data.get("requests", 0.0),
+            errors=data.get("errors", 0.0),
+            throttled=data.get("throttled", 0.0),
+            server_errors=data.get("server_errors", 0.0),
+            updated_at=data.get("updated_at", 0.0),
+            consecutive_failures=data.get("consecutive_failures", 0),
+            ejected_until=data.get("ejected_until", 0.0),
+        )
+
+
+class GatewayHealthTracker:
+    """Per-gateway latency and error statistics in an exponentially decayed window.
+
+    Every observation's weight halves each `half_life` seconds. A gateway that
+    keeps failing, or whose decayed error rate is too high, is ejected for
+    `cooldown` seconds and then given another chance.
+    """
+
+    def __init__(
+        self,
+        half_life: float = 300.0,
+        max_samples: int = 64,
+        min_samples: int = 5,
+        failure_threshold: int = 3,
+        max_error_rate: float = 0.5,
+        cooldown: float = 60.0,
+    ):
+        self.half_life = half_life
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.hosts: Dict[str, GatewayStats] = {}
+
+    def _stats(self, host: str) -> GatewayStats:
+        if host not in self.hosts:
+            self.hosts[host] = GatewayStats(samples=deque(maxlen=self.max_samples))
+        return self.hosts[host]
+
+    def _decay(self, age: float) -> float:
+        return 0.5 ** (max(age, 0.0) / self.half_life)
+
+    def record(self, host: str, latency: float, status: Optional[int]):
+        """Record one request. A `status` of None means timeout or connection error.
+
+        429s and 5xx count as errors, and are also tallied apart as `throttled`
+        and `server_errors`.
+        """
+        now = time.time()
+        stats = self._stats(host)
+        decay = self._decay(now - stats.updated_at)
+        throttled = status == 429
+        server_error = status is not None and status >= 500
+        failed = status is None or throttled or server_error
+        stats.requests = stats.requests * decay + 1
+        stats.errors = stats.errors * decay + (1 if failed else 0)
+        stats.throttled = stats.throttled * decay + (1 if throttled else 0)
+        stats.server_errors = stats.server_errors * decay + (1 if server_error else 0)
+        stats.updated_at = now
+        if failed:
+            stats.consecutive_failures += 1
+            if self._should_eject(stats):
+                stats.ejected_until = now + self.cooldown
+                logger.info(f"Ejecting IPFS Gateway {host} for {self.cooldown}s")
+        else:
+            stats.consecutive_failures = 0
+            stats.ejected_until = 0.0
+            stats.samples.append((now, latency))
+
+    def _should_eject(self, stats: GatewayStats) -> bool:
+        if stats.consecutive_failures >= self.failure_threshold:
+            return True
+        return (
+            stats.requests >= self.min_samples
+            and stats.errors / stats.requests >= self.max_error_rate
+        )
+
+    def error_rate(self, host: str) -> float:
+        stats = self.hosts.get(host)
+        if stats is None or stats.requests == 0:
+            return 0.0
+        return stats.errors / stats.requests
+
+    def throttle_rate(self, host: str) -> float:
+        """The decayed share of requests answered 429."""
+        stats = self.hosts.get(host)
+        if stats is None or stats.requests == 0:
+            return 0.0
+        return stats.throttled / stats.requests
+
+    def server_error_rate(self, host: str) -> float:
+        """The decayed share of requests answered 5xx."""
+        stats = self.hosts.get(host)
+        if stats is None or stats.requests == 0:
+            return 0.0
+        return stats.server_errors / stats.requests
+
+    def latency_percentile(self, host: str, percentile: float) -> Optional[float]:
+        stats = self.hosts.get(host)
+        if stats is None or len(stats.samples) < self.min_samples:
+            return None
+        now = time.time()
+        weighted = sorted(
+            (latency, self._decay(now - timestamp))
+            for timestamp, latency in stats.samples
+        )
+        target = sum(weight for _, weight in weighted) * percentile / 100
+        cumulative = 0.0
+        for latency, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return latency
+        return weighted[-1][0]
+
+    def is_healthy(self, host: str) -> bool:
+        stats = self.hosts.get(host)
+        return stats is None or stats.ejected_until <= time.time()
+
+    def score(self, host: str) -> float:
+        # Gateways without enough samples score 0 so they get tried and measured.
+        # Every failure is penalised through error_rate; a 429 is penalised
+        # again, since the gateway is asking to be sent less traffic.
+        latency = self.latency_percentile(host, 50)
+        if latency is None:
+            return 0.0
+        return latency * (1 + 4 * self.error_rate(host) + 4 * self.throttle_rate(host))
+
+    def rank(self, hosts: List[str]) -> List[str]:
+        """Healthy gateways ordered fastest first.
+
+        If every gateway is ejected they are all returned, best score first,
+        so requests are never left without a gateway.
+        """
+        ranked = sorted(hosts, key=self.score)
+        healthy = [host for host in ranked if self.is_healthy(host)]
+        return healthy or ranked
+
+    def hedge_delay(self, host: str, default: float) -> float:
+        if default <= 0:
+            return default
+        p95 = self.latency_percentile(host, 95)
+        return default if p95 is None else min(p95, default)
+
+    def save(self, path: str):
+        data = {host: stats.to_dict() for host, stats in self.hosts.items()}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load IPFS Gateway stats from {path}. Error: {e}")
+            return
+        self.hosts = {
+            host: GatewayStats.from_dict(stats, self.max_samples)
+            for host, stats in data.items()
+        }
+
+
+# One tracker per process, so warm invocations keep ranking by what earlier
+# ones observed. IPFS_GATEWAY_STATS_PATH seeds it at import; a closing Fetcher
+# writes it back for the next process.
+gateway_tracker = GatewayHealthTracker()
+if Config.IPFS_GATEWAY_STATS_PATH:
+    gateway_tracker.load(Config.IPFS_GATEWAY_STATS_PATH)
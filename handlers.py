@@ -1,13 +1,17 @@
+import asyncio
 import logging
-import requests
-import boto3
 import time
 import json
 from enum import Enum
 
-from engine import AssetExtractionEngine, RetryEngine, PublicRetryEngine
+from analytics import get_analytics_sink
 from config import Config
 from asset_fetcher import AssetFetcher
+from clients import get_lambda_client
+
+# The GET handlers only need boto3. The engine (aiohttp, aioboto3, Pillow)
+# is imported by the handlers that use it, to keep cold starts of the read
+# path short.
 
 logger = logging.getLogger("app_log")
 
@@ -28,37 +32,102 @@ class EventName(Enum):
     ANIMATIONS = "metadata_animations"
 
 
-def mixpanel_tracking(event: EventName, ip_address: str, token_id: str):
-    payload = [
-        {
-            "event": event.value,
-            "properties": {
-                "time": int(time.time()),
-                "ip_address": ip_address,
-                "token_id": token_id,
-                "token": Config.MIXPANEL_PROJECT_TOKEN,
-            },
-        }
-    ]
-    requests.post(
-        "https://api.mixpanel.com/track",
-        params={"strict": "1"},
-        headers={"Content-Type": "application/json"},
-        data=json.dumps(payload),
+def track_event(event: EventName, ip_address: str, token_id: str):
+    get_analytics_sink().track(
+        event.value,
+        {"time": int(time.time()), "ip_address": ip_address, "token_id": token_id},
     )
 
 
 def nft_data_handler(event, _context):
+    from engine import AssetExtractionEngine
+
     data = event["result"]
     engine = AssetExtractionEngine(data)
     engine.run()
 
 
+def _sqs_transactions(records):
+    """Transactions of every SQS message, the messageId of each, and the
+    messageIds whose body could not be parsed."""
+    from utils import unwrap_transactions
+
+    transactions, message_ids, unparsed = [], [], []
+    for record in records:
+        try:
+            body = unwrap_transactions(json.loads(record["body"]))
+        except Exception as e:  # noqa
+            logger.error(f"Could not parse message {record['messageId']}. Error: {e}")
+            unparsed.append(record["messageId"])
+            continue
+        transactions.extend(body)
+        message_ids.extend([record["messageId"]] * len(body))
+    return transactions, message_ids, unparsed
+
+
+def nft_batch_handler(event, _context):
+    """Extract assets for many NFTokenMint transactions in one invocation.
+
+    Accepts an SQS batch (each message one `nft_data_handler` event, one
+    transaction or a list of them), an S3 dump (`{"bucket": ..., "key": ...}`)
+    or `{"transactions": [...]}`. For SQS a message is reported in
+    `batchItemFailures`, and so retried, if its body cannot be parsed or any
+    of its transactions fails.
+    """
+    from engine import BatchAssetExtractionEngine
+    from utils import read_s3_json, unwrap_transactions
+
+    records = event.get("Records")
+    if records is not None:
+        transactions, message_ids, unparsed = _sqs_transactions(records)
+    elif "bucket" in event:
+        transactions = unwrap_transactions(
+            read_s3_json(Config, event["bucket"], event["key"])
+        )
+    else:
+        transactions = unwrap_transactions(event)
+
+    results = BatchAssetExtractionEngine(transactions).run()
+    failed = [result for result in results if result["status"] == "failed"]
+    if records is not None:
+        failed_ids = unparsed + [message_ids[result["index"]] for result in failed]
+        return {
+            "batchItemFailures": [
+                {"itemIdentifier": message_id}
+                for message_id in dict.fromkeys(failed_ids)
+            ]
+        }
+    return {"statusCode": 200, "processed": len(results), "failed": failed}
+
+
+def nft_ledger_handler(event, _context):
+    """Extract assets for every NFToken added in one ledger.
+
+    Accepts `{"ledger_index": ...}` (fetched over JSON-RPC), a saved ledger
+    on S3 (`{"bucket": ..., "key": ...}`) or `{"ledger": {...}}`.
+    """
+    from engine import LedgerAssetExtractionEngine
+    from utils import fetch_ledger_async, read_s3_json
+
+    if "ledger" in event:
+        ledger = event["ledger"]
+    elif "bucket" in event:
+        ledger = read_s3_json(Config, event["bucket"], event["key"])
+    else:
+        ledger = asyncio.run(fetch_ledger_async(event["ledger_index"]))
+    if ledger is None:
+        return {"statusCode": 404, "body": '{"message": "Ledger not found"}'}
+
+    results = LedgerAssetExtractionEngine(ledger).run()
+    failed = [result for result in results if result["status"] == "failed"]
+    return {"statusCode": 200, "processed": len(results), "failed": failed}
+
+
 def fetch_images_handler(event, _context):
     token_id = event["pathParameters"]["token_id"]
     fetcher = AssetFetcher(event)
     result = fetcher.fetch(asset_type="image")
-    mixpanel_tracking(EventName.IMAGES, "", token_id)
+    track_event(EventName.IMAGES, "", token_id)
     return result
 
 
@@ -66,7 +135,7 @@ def fetch_thumbnail_handler(event, _context):
     token_id = event["pathParameters"]["token_id"]
     fetcher = AssetFetcher(event)
     result = fetcher.fetch(asset_type="thumbnail")
-    mixpanel_tracking(EventName.THUMBNAILS, "", token_id)
+    track_event(EventName.THUMBNAILS, "", token_id)
     return result
 
 
@@ -74,7 +143,7 @@ def fetch_animation_handler(event, _context):
     token_id = event["pathParameters"]["token_id"]
     fetcher = AssetFetcher(event)
     result = fetcher.fetch(asset_type="animation")
-    mixpanel_tracking(EventName.ANIMATIONS, "", token_id)
+    track_event(EventName.ANIMATIONS, "", token_id)
     return result
 
 
@@ -82,7 +151,7 @@ def fetch_metadata_handler(event, _context):
     token_id = event["pathParameters"]["token_id"]
     fetcher = AssetFetcher(event)
     result = fetcher.fetch(asset_type="metadata")
-    mixpanel_tracking(EventName.METADATA, "", token_id)
+    track_event(EventName.METADATA, "", token_id)
     return result
 
 
@@ -100,11 +169,13 @@ def fetch_video_handler(event, _context):
 def fetch_project_metadata(event, _context):
     fetcher = AssetFetcher(event)
     result = fetcher.fetch_project_metadata()
-    mixpanel_tracking(EventName.COLLECTIONS, "", "")
+    track_event(EventName.COLLECTIONS, "", "")
     return result
 
 
 def retry(event, _context):
+    from engine import RetryEngine
+
     path = event["Records"][0]["s3"]["object"]["key"]
     engine = RetryEngine(path=path)
     engine.run()
@@ -114,13 +185,7 @@ def public_retry_api(event, _context):
     payload = bytes(
         json.dumps({"token_id": event["pathParameters"].get("token_id", None)}), "utf-8"
     )
-    lambda_client = boto3.client(
-        "lambda",
-        region_name="eu-west-2",
-        aws_access_key_id=Config.ACCESS_KEY_ID,
-        aws_secret_access_key=Config.SECRET_ACCESS_KEY,
-    )
-    resp = lambda_client.invoke(
+    resp = get_lambda_client().invoke(
         FunctionName="retry", InvocationType="Event", Payload=payload
     )
     logger.info(resp)
@@ -128,7 +193,23 @@ def public_retry_api(event, _context):
 
 
 def public_retry(event, _content):
+    from engine import PublicRetryEngine
+
     token_id = event["token_id"]
     engine = PublicRetryEngine(token_id=token_id)
     engine.run()
     return {"statusCode": 200}
+
+
+def ship_analytics(event, _context):
+    """Forward analytics events queued by the `sqs` or `log` sinks to Mixpanel."""
+    from analytics import parse_log_subscription, send_to_mixpanel
+
+    events = []
+    for record in event.get("Records", []):
+        events.extend(json.loads(record["body"]))
+    if "awslogs" in event:
+        events.extend(parse_log_subscription(event["awslogs"]["data"]))
+    if events:
+        send_to_mixpanel(events)
+    return {"statusCode": 200}
@@ -1,34 +1,170 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from io import BytesIO
 from PIL import Image, ImageFile
-from typing import Optional
+from typing import Dict, Optional, Tuple
+import asyncio
+import atexit
+
+from config import Config
+from exceptions import ImageTooLargeException
 
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
 
-def process_image(content: bytes):
+class ImageWorkerPool:
+    """Runs Pillow work off the event loop.
+
+    `kind` is `thread`, `process` or `inline` (run on the loop, as before).
+    At most `max_workers + max_queue` jobs are submitted at once; callers past
+    that wait for a slot, which keeps memory bounded when many images arrive
+    together.
+    """
+
+    def __init__(
+        self,
+        kind: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+    ):
+        self.kind = kind or Config.IMAGE_EXECUTOR
+        self.max_workers = max_workers or Config.IMAGE_EXECUTOR_WORKERS
+        self.max_queue = (
+            max_queue if max_queue is not None else Config.IMAGE_EXECUTOR_QUEUE_SIZE
+        )
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="image"
+                )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_workers + self.max_queue)
+            self._loop = loop
+        return self._semaphore
+
+    async def run(self, fn, *args):
+        if self.kind == "inline":
+            return fn(*args)
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, partial(fn, *args))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+image_pool = ImageWorkerPool()
+atexit.register(image_pool.shutdown)
+
+
+def encode_image(image, content_type: str) -> bytes:
+    buffer = BytesIO()
+    fmt = content_type.split("/")[-1]
+    image.save(buffer, format=fmt.upper())
+    return buffer.getvalue()
+
+
+def _content_type_format(content_type: str) -> str:
+    fmt = content_type.split("/")[-1].upper()
+    return "JPEG" if fmt == "JPG" else fmt
+
+
+def _image_format(img) -> Optional[str]:
+    # MPO is the multi-picture JPEG written by many cameras; it is valid JPEG.
+    return "JPEG" if img.format == "MPO" else img.format
+
+
+def _open_image(content: bytes):
+    """Open `content`, raising ImageTooLargeException past IMAGE_MAX_PIXELS
+    before any pixel data is decoded."""
     img = Image.open(BytesIO(content))
     width, height = img.size
-    aspect_ratio = width / height
-    new_height = 200
-    new_width = int(aspect_ratio * new_height)
-    new_image = img.resize((new_width, new_height))
-    return img, new_image
+    if width * height > Config.IMAGE_MAX_PIXELS:
+        raise ImageTooLargeException(
+            f"Image is {width}x{height}, over the {Config.IMAGE_MAX_PIXELS} pixel limit"
+        )
+    return img
+
+
+def _reduced_resize(img, size: Tuple[int, int]):
+    """Resize `img` to `size`, decoding at a fraction of its size where possible.
+
+    `draft` lets JPEG decode straight at 1/2, 1/4 or 1/8 scale (a no-op for
+    other formats or already loaded images), and `reducing_gap` shrinks by
+    an integer factor with `reduce` before the final resample.
+    """
+    img.draft(img.mode, size)
+    return img.resize(
+        size,
+        resample=Image.Resampling[Config.IMAGE_RESAMPLE.upper()],
+        reducing_gap=Config.IMAGE_REDUCING_GAP,
+    )
+
+
+def render_image(
+    content: bytes, content_type: str
+) -> Tuple[bytes, Dict[Tuple[int, int], bytes]]:
+    """Return the encoded full image and its PNG renditions for `content`.
+
+    Renditions are keyed by (width, height), one per Config.IMAGE_RENDITIONS entry
+    up to the source height; the 200px thumbnail is always produced. The
+    source is decoded once, at the smallest draft scale that still covers
+    the largest rendition.
+
+    The original bytes are reused for the full image unless they are not in
+    the format `content_type` claims, in which case they are transcoded.
+    """
+    img = _open_image(content)
+    width, height = img.size
+    sizes = {
+        rendition: (max(1, int(width / height * rendition)), rendition)
+        for rendition in Config.IMAGE_RENDITIONS
+        if rendition <= height or rendition == 200
+    }
+    if _image_format(img) == _content_type_format(content_type):
+        full_content = content
+    else:
+        full_content = encode_image(img, content_type)
+    img.draft(img.mode, sizes[max(sizes)])
+    img.load()
+    return full_content, {
+        size: encode_image(_reduced_resize(img, size), "image/png")
+        for size in sizes.values()
+    }
 
 
 def resize_image(
-    content: bytes, req_height: Optional[str], req_width: Optional[str]
+    content: bytes, req_height: Optional[int], req_width: Optional[int]
 ) -> BytesIO:
-    img = Image.open(BytesIO(content))  # noqa
+    """Resize `content` to a JPEG of the requested height or width, which is
+    capped at the source's own so images are never upscaled."""
+    img = _open_image(content)  # noqa
     width, height = img.size
     aspect_ratio = width / height
 
     if req_height:
-        req_width = int(int(req_height) * aspect_ratio)
+        req_height = min(int(req_height), height)
+        req_width = int(req_height * aspect_ratio)
     elif req_width:
-        req_height = int(int(req_width) * 1 / aspect_ratio)
+        req_width = min(int(req_width), width)
+        req_height = int(req_width * 1 / aspect_ratio)
     else:
         req_width, req_height = width, height
-    new_image = img.resize((int(req_width), int(req_height)))
+    new_image = _reduced_resize(img, (max(1, int(req_width)), max(1, int(req_height))))
     output_buffer = BytesIO()
     new_image.save(output_buffer, format="JPEG")
     return output_buffer
@@ -1,14 +1,16 @@
 import argparse
+import asyncio
 import json
 
 from engine import (
     AssetExtractionEngine,
+    LedgerAssetExtractionEngine,
     RetryEngine,
     PublicRetryEngine,
-    TextMetadataRerunEngine,
     Config,
 )
-from utils import fetch_text_objects
+from parallel import STAGES, run_parallel, run_shard
+from utils import fetch_ledger_async, get_last_file_dump_path, read_s3_json
 import logging
 
 
@@ -29,10 +31,35 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "--stage",
-        help="For asset extraction, we have `nft-mint`, `retry`, `public-retry` and `projects-retry`",
+        help="For asset extraction, we have `nft-mint`, `nft-mint-batch`, `nft-ledger`, `retry`, `public-retry` and `projects-retry`",
     )
     parser.add_argument("--data_path", help="Path to the json file for input")
     parser.add_argument("--token_id", help="NFT token id")
+    parser.add_argument("--ledger_index", help="Ledger to extract for `nft-ledger`")
+    parser.add_argument(
+        "--checkpoint",
+        default=Config.RERUN_CHECKPOINT,
+        help="Local path or s3://bucket/key for `text-metadata` progress",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue `text-metadata` after the key recorded in the checkpoint",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Run `text-metadata`, `retry` (all notfound/ objects) or "
+        "`nft-mint-batch` on this many processes, one shard each",
+    )
+    parser.add_argument("--shard_index", type=int, default=0)
+    parser.add_argument(
+        "--shard_count",
+        type=int,
+        default=1,
+        help="Split the keys of sharded stages across this many machines",
+    )
     args = parser.parse_args()
 
     # Initialize Loggers
@@ -54,7 +81,54 @@ if __name__ == "__main__":
 
     # Execute the command
     if command == "extract":
-        if stage == "nft-mint":
+        if stage in STAGES and not (stage == "retry" and args.data_path):
+            options = {
+                "checkpoint": args.checkpoint,
+                "resume": args.resume,
+                "data_path": args.data_path,
+            }
+            if stage == "nft-mint-batch" and args.data_path is None:
+                # Resolve the latest dump once, so every worker reads the same one.
+                options["data_path"] = get_last_file_dump_path(
+                    Config.ACCESS_KEY_ID,
+                    Config.SECRET_ACCESS_KEY,
+                    Config.NFT_MINT_DUMP_BUCKET,
+                )
+                if options["data_path"] is None:
+                    parser.error(
+                        f"No NFTokenMint dump in {Config.NFT_MINT_DUMP_BUCKET}; "
+                        "pass --data_path"
+                    )
+            if args.workers > 1:
+                run_parallel(
+                    stage, args.workers, options, args.shard_index, args.shard_count
+                )
+            else:
+                stats = run_shard(stage, args.shard_index, args.shard_count, options)
+                logger.info(f"{stage} Completed: {json.dumps(stats)}")
+
+        elif stage == "nft-ledger":
+            # A saved `ledger` response (file or s3://bucket/key) or a ledger index.
+            path = args.data_path
+            if args.ledger_index is None and path is None:
+                parser.error("nft-ledger needs --ledger_index or --data_path")
+            if args.ledger_index is not None:
+                ledger_index = args.ledger_index
+                if ledger_index.isdigit():
+                    ledger_index = int(ledger_index)
+                ledger = asyncio.run(fetch_ledger_async(ledger_index))
+            elif path.startswith("s3://"):
+                bucket, key = path.replace("s3://", "").split("/", 1)
+                ledger = read_s3_json(Config, bucket, key)
+            else:
+                ledger = json.load(open(path, "r"))
+            results = LedgerAssetExtractionEngine(ledger).run()
+            failed = [result for result in results if result["status"] == "failed"]
+            logger.info(f"Processed {len(results)} Transactions, {len(failed)} Failed")
+            for result in failed:
+                logger.info(f"Failed: {json.dumps(result)}")
+
+        elif stage == "nft-mint":
             path = args.data_path
             data = json.load(open(path, "r"))
             engine = AssetExtractionEngine(data)
@@ -72,11 +146,6 @@ if __name__ == "__main__":
                 engine.data = data
             engine.run()
 
-        elif stage == "text-metadata":
-            paths = fetch_text_objects(Config)
-            engine = TextMetadataRerunEngine(paths=paths)
-            engine.run()
-
         elif stage == "public-retry":
             token_id = args.token_id
             engine = PublicRetryEngine(token_id=token_id)
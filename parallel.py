@@ -0,0 +1,242 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Optional
+import json
+import logging
+import multiprocessing
+import queue
+import time
+
+from config import Config
+
+logger = logging.getLogger("app_log")
+
+COUNT_FIELDS = (
+    "processed",
+    "succeeded",
+    "skipped",
+    "failed",
+    "timed_out",
+    "deleted",
+)
+MAX_FIELDS = ("latency_p95", "latency_max")
+
+# Set in pool workers to the queue `run_parallel` reads progress from.
+_progress_queue = None
+
+
+def progress_reporter(shard_index: int) -> Callable[[Dict], None]:
+    """Sends a shard's running stats to the parent process, if there is one."""
+
+    def report(stats: Dict):
+        if _progress_queue is not None:
+            _progress_queue.put((shard_index, stats))
+
+    return report
+
+
+def run_text_metadata(
+    shard_index: int,
+    shard_count: int,
+    checkpoint: Optional[str] = None,
+    resume: bool = False,
+    **_options,
+) -> Dict:
+    from checkpoint import CheckpointTracker, get_checkpoint_store
+    from engine import TextMetadataRerunEngine
+    from utils import iter_text_objects
+
+    store = get_checkpoint_store(
+        checkpoint or Config.RERUN_CHECKPOINT, shard_index, shard_count
+    )
+    saved = store.load() if resume else None
+    if saved is not None:
+        logger.info(f"Resuming after {saved.last_key} from {store}")
+    # Keys are streamed page by page while the engine works on them.
+    paths = iter_text_objects(Config, start_after=saved.last_key if saved else None)
+    tracker = CheckpointTracker(store, saved)
+    report = progress_reporter(shard_index)
+    engine = TextMetadataRerunEngine(
+        paths=paths,
+        checkpoint=tracker,
+        shard_index=shard_index,
+        shard_count=shard_count,
+        on_progress=lambda stats: report(
+            {**stats.to_dict(), "deleted": tracker.checkpoint.deleted}
+        ),
+    )
+    engine.run()
+    return {**engine.stats.to_dict(), "deleted": tracker.checkpoint.deleted}
+
+
+def run_failed_objects_retry(shard_index: int, shard_count: int, **_options) -> Dict:
+    from engine import FailedObjectsRetryEngine
+    from utils import iter_failed_objects
+
+    report = progress_reporter(shard_index)
+    engine = FailedObjectsRetryEngine(
+        iter_failed_objects(Config),
+        shard_index=shard_index,
+        shard_count=shard_count,
+        on_progress=lambda stats: report(stats.to_dict()),
+    )
+    engine.run()
+    return engine.stats.to_dict()
+
+
+def run_transactions(
+    shard_index: int, shard_count: int, data_path: str, **_options
+) -> Dict:
+    from engine import BatchAssetExtractionEngine
+    from utils import load_transactions
+
+    # The shard key of a transaction is its position in the input.
+    transactions = [
+        transaction
+        for index, transaction in enumerate(load_transactions(data_path, Config))
+        if index % shard_count == shard_index
+    ]
+    start = time.monotonic()
+    results = BatchAssetExtractionEngine(transactions).run()
+    elapsed = time.monotonic() - start
+    failed = [result for result in results if result["status"] == "failed"]
+    skipped = sum(1 for result in results if result["status"] == "skipped")
+    for result in failed:
+        logger.info(f"Failed: {json.dumps(result)}")
+    return {
+        "processed": len(results),
+        "succeeded": len(results) - len(failed) - skipped,
+        "skipped": skipped,
+        "failed": len(failed),
+        "elapsed": round(elapsed, 3),
+    }
+
+
+STAGES = {
+    "text-metadata": run_text_metadata,
+    "retry": run_failed_objects_retry,
+    "nft-mint-batch": run_transactions,
+}
+
+
+def run_shard(stage: str, shard_index: int, shard_count: int, options: Dict) -> Dict:
+    return STAGES[stage](shard_index, shard_count, **options)
+
+
+def _init_worker(progress_queue=None):
+    global _progress_queue
+    _progress_queue = progress_queue
+    # Spawned workers do not inherit the parent's logging setup.
+    app_logger = logging.getLogger("app_log")
+    if not app_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(
+            logging.Formatter(
+                "%(asctime)s [%(processName)-12.12s] [%(levelname)-5.5s]  %(message)s"
+            )
+        )
+        app_logger.addHandler(handler)
+        app_logger.setLevel(logging.INFO)
+
+
+def merge_stats(total: Dict, stats: Dict):
+    for name in COUNT_FIELDS:
+        total[name] = total.get(name, 0) + stats.get(name, 0)
+    for name in MAX_FIELDS:
+        if name in stats:
+            total[name] = max(total.get(name, 0.0), stats[name])
+
+
+def _drain(progress_queue, latest: Dict[int, Dict], finished: set):
+    while True:
+        try:
+            shard, stats = progress_queue.get_nowait()
+        except queue.Empty:
+            return
+        # A report can arrive after the shard's final stats; keep the final.
+        if shard not in finished:
+            latest[shard] = stats
+
+
+def run_parallel(
+    stage: str,
+    workers: int,
+    options: Dict,
+    shard_index: int = 0,
+    shard_count: int = 1,
+) -> Dict:
+    """Run `stage` over `workers` processes, each on its own shard of the keys.
+
+    Every worker is a fresh (spawned) interpreter with its own event loop,
+    HTTP session, S3 clients and image pool. Combined with `shard_index` and
+    `shard_count` (e.g. one shard per machine), worker `i` takes sub-shard
+    `shard_index * workers + i` of `shard_count * workers`. Workers report
+    their running stats every PROGRESS_INTERVAL seconds, and the running
+    total is logged as they arrive.
+    """
+    start = time.monotonic()
+    context = multiprocessing.get_context("spawn")
+    progress_queue = context.Queue()
+    # Latest stats per sub-shard: progress reports, then the final result.
+    latest: Dict[int, Dict] = {}
+    finished = set()
+    failed_shards = []
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(progress_queue,),
+    ) as executor:
+        futures = {
+            executor.submit(
+                run_shard,
+                stage,
+                shard_index * workers + worker,
+                shard_count * workers,
+                options,
+            ): shard_index
+            * workers
+            + worker
+            for worker in range(workers)
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(
+                pending, timeout=Config.PROGRESS_INTERVAL, return_when=FIRST_COMPLETED
+            )
+            _drain(progress_queue, latest, finished)
+            for future in done:
+                shard = futures[future]
+                worker = shard - shard_index * workers
+                finished.add(shard)
+                try:
+                    latest[shard] = future.result()
+                except Exception as e:
+                    logger.error(f"Worker {worker} failed. Error: {e}")
+                    latest.pop(shard, None)
+                    failed_shards.append(worker)
+                    continue
+                logger.info(
+                    f"Worker {worker} finished ({len(finished)}/{workers}): "
+                    f"{json.dumps(latest[shard])}"
+                )
+            total: Dict = {}
+            for stats in latest.values():
+                merge_stats(total, stats)
+            if pending and total:
+                elapsed = time.monotonic() - start
+                logger.info(
+                    f"{stage} progress, {len(finished)}/{workers} workers done: "
+                    f"{json.dumps(total)} "
+                    f"({round(total.get('processed', 0) / elapsed, 3)} items/s)"
+                )
+    progress_queue.close()
+    elapsed = time.monotonic() - start
+    summary = {
+        **total,
+        "workers": workers,
+        "failed_workers": failed_shards,
+        "elapsed": round(elapsed, 3),
+        "throughput": round(total.get("processed", 0) / elapsed, 3),
+    }
+    logger.info(f"{stage} Completed on {workers} workers: {json.dumps(summary)}")
+    return summary
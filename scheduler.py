@@ -0,0 +1,186 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Optional,
+    Union,
+)
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("app_log")
+
+_DONE = object()
+
+
+async def aiterate(items: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+@dataclass
+class SchedulerStats:
+    succeeded: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    started_at: float = 0.0
+    finished_at: float = 0.0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+    # Percentiles are taken over the most recent items only, so a long run
+    # does not keep one float per item.
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=10000))
+
+    @property
+    def processed(self) -> int:
+        return self.succeeded + self.failed + self.timed_out
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def record(self, latency: float):
+        self.latencies.append(latency)
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def latency_percentile(self, percentile: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+    def to_dict(self) -> Dict:
+        return {
+            "processed": self.processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "elapsed": round(self.elapsed, 3),
+            "throughput": round(self.throughput, 3),
+            "latency_mean": round(
+                self.total_latency / self.processed if self.processed else 0.0, 3
+            ),
+            "latency_p50": round(self.latency_percentile(50), 3),
+            "latency_p95": round(self.latency_percentile(95), 3),
+            "latency_max": round(self.max_latency, 3),
+        }
+
+
+class WorkScheduler:
+    """Runs `worker(item)` over `items` with a steady number of items in flight.
+
+    `concurrency` workers pull from a bounded queue, so a slow item only
+    holds its own slot instead of stalling a whole chunk. `items` may be an
+    async iterable, such as a paginated S3 listing, and is only consumed as
+    fast as workers free up. Each item gets `item_timeout` seconds (None for
+    no limit); failures and timeouts are counted and logged, never raised.
+    `on_done(item, status, result)` is awaited after each item, with status
+    `succeeded`, `failed` or `timed_out`. `on_progress(stats)` is called at
+    most every `progress_interval` seconds while the run goes on.
+    Network fetches, image work and S3 writes stay bounded by their own
+    limits (FETCH_CONNECTION_LIMIT, IMAGE_EXECUTOR_WORKERS,
+    S3_WRITE_CONCURRENCY) underneath.
+    """
+
+    def __init__(
+        self,
+        worker: Callable[[Any], Awaitable],
+        concurrency: int,
+        item_timeout: Optional[float] = None,
+        name: str = "Work",
+        on_done: Optional[Callable[[Any, str, Any], Awaitable]] = None,
+        on_progress: Optional[Callable[[SchedulerStats], None]] = None,
+        progress_interval: float = 30.0,
+    ):
+        self.worker = worker
+        self.concurrency = concurrency
+        self.item_timeout = item_timeout
+        self.name = name
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+        self._reported_at = 0.0
+
+    async def _process(self, item, stats: SchedulerStats):
+        start = time.monotonic()
+        result = None
+        try:
+            if self.item_timeout:
+                result = await asyncio.wait_for(
+                    self.worker(item), timeout=self.item_timeout
+                )
+            else:
+                result = await self.worker(item)
+            status = "succeeded"
+            stats.succeeded += 1
+        except asyncio.TimeoutError:
+            status = "timed_out"
+            stats.timed_out += 1
+            logger.error(f"Timed out after {self.item_timeout}s processing {item}")
+        except Exception as e:
+            status = "failed"
+            stats.failed += 1
+            logger.error(f"Error processing {item}. Error: {e}")
+        finally:
+            stats.record(time.monotonic() - start)
+        if self.on_done is not None:
+            await self.on_done(item, status, result)
+        if (
+            self.on_progress is not None
+            and time.monotonic() - self._reported_at >= self.progress_interval
+        ):
+            self._reported_at = time.monotonic()
+            self.on_progress(stats)
+
+    async def _work(self, queue: asyncio.Queue, stats: SchedulerStats):
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            await self._process(item, stats)
+
+    async def run(self, items: Union[Iterable, AsyncIterable]) -> SchedulerStats:
+        stats = SchedulerStats(started_at=time.monotonic())
+        self._reported_at = stats.started_at
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        workers = [
+            asyncio.ensure_future(self._work(queue, stats))
+            for _ in range(self.concurrency)
+        ]
+        try:
+            async for item in aiterate(items):
+                await queue.put(item)
+            for _ in workers:
+                await queue.put(_DONE)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            stats.finished_at = time.monotonic()
+        summary = stats.to_dict()
+        logger.info(
+            f"{self.name} Completed: {summary['succeeded']} succeeded, "
+            f"{summary['failed']} failed, {summary['timed_out']} timed out "
+            f"in {summary['elapsed']}s ({summary['throughput']} items/s, "
+            f"p50 {summary['latency_p50']}s, p95 {summary['latency_p95']}s, "
+            f"max {summary['latency_max']}s)"
+        )
+        return stats
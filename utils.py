@@ -1,20 +1,31 @@
-from typing import Optional
+from typing import AsyncIterator, List, Optional
 import boto3
 import aioboto3
 import aiohttp
 import logging
 import json
 import requests
+import zlib
+from xrpl.core.addresscodec import encode_classic_address
+
+from exceptions import AccountInfoException
 
 logger = logging.getLogger("app_log")
 
 JSON_RPC_URL = "https://s2.ripple.com:51234/"
+# Not under the `NFTokenMint` prefix, so it never shows up in the listing.
+DUMP_INDEX_KEY = "index/NFTokenMint-latest.json"
 
 
 def hex_to_text(hex_str: str) -> str:
     return bytes.fromhex(hex_str).decode("utf-8")
 
 
+def nftoken_issuer(token_id: str) -> str:
+    """Issuer of an NFToken; its AccountID is bytes 4-24 of the NFTokenID."""
+    return encode_classic_address(bytes.fromhex(token_id[8:48]))
+
+
 def is_ipfs(url: str):
     return True if url.startswith("ipfs://") else False
 
@@ -32,16 +43,105 @@ def get_file_extension(file_path: str) -> Optional[str]:
     return split[-1] if split else None
 
 
-def get_last_file_dump(access_key: str, secret_key: str, bucket: str):
-    s3 = boto3.resource(
+def _read_dump_index(s3, bucket: str, index_key: str) -> Optional[str]:
+    try:
+        res = s3.get_object(Bucket=bucket, Key=index_key)
+    except Exception:  # noqa
+        return None
+    return json.load(res["Body"]).get("key")
+
+
+def find_last_file_dump(
+    s3, bucket: str, prefix: str = "NFTokenMint", index_key: str = DUMP_INDEX_KEY
+) -> Optional[str]:
+    """Key of the latest dump under `prefix`.
+
+    ListObjectsV2 returns keys in ascending order, so the last key listed is
+    the latest one. The listing starts after the key recorded in `index_key`
+    on the previous call, so only dumps written since then are paged through.
+
+    This writes `index_key` into `bucket` whenever a newer dump is found, so
+    it needs s3:PutObject there as well as read access. The write is
+    best-effort: if it fails the error is logged, the key is still returned
+    and the next call lists from the older index.
+    """
+    indexed = _read_dump_index(s3, bucket, index_key)
+    params = {"Bucket": bucket, "Prefix": prefix}
+    if indexed is not None:
+        params["StartAfter"] = indexed
+    last_key = indexed
+    for page in s3.get_paginator("list_objects_v2").paginate(**params):
+        contents = page.get("Contents", [])
+        if contents:
+            last_key = contents[-1]["Key"]
+    if last_key is not None and last_key != indexed:
+        try:
+            s3.put_object(
+                Bucket=bucket,
+                Key=index_key,
+                Body=json.dumps({"key": last_key}),
+                ContentType="application/json",
+            )
+        except Exception as e:  # noqa
+            logger.error(f"Could not update dump index {bucket}/{index_key}: {e}")
+    return last_key
+
+
+def get_last_file_dump_path(
+    access_key: str, secret_key: str, bucket: str
+) -> Optional[str]:
+    s3 = boto3.client(
         "s3", aws_access_key_id=access_key, aws_secret_access_key=secret_key
     )
-    s3_bucket = s3.Bucket(bucket)
-    last_file = sorted(
-        [obj.key for obj in s3_bucket.objects.filter(Prefix="NFTokenMint")]
-    )[-1]
-    obj = s3.Object(bucket, last_file)
-    return json.load(obj.get()["Body"])
+    last_file = find_last_file_dump(s3, bucket)
+    return None if last_file is None else f"s3://{bucket}/{last_file}"
+
+
+def read_s3_json(config, bucket: str, key: str):
+    s3 = boto3.resource(
+        "s3",
+        aws_access_key_id=config.ACCESS_KEY_ID,
+        aws_secret_access_key=config.SECRET_ACCESS_KEY,
+    )
+    return json.load(s3.Object(bucket, key).get()["Body"])
+
+
+def unwrap_transactions(data) -> List[dict]:
+    """Transactions from a list, a `{"transactions": [...]}` payload or one
+    transaction. Items shaped like the `nft_data_handler` event (`{"result":
+    transaction}`) are unwrapped."""
+    if isinstance(data, dict):
+        data = data.get("transactions", [data])
+    return [item["result"] if "result" in item else item for item in data]
+
+
+def ledger_transactions(data) -> List[dict]:
+    """Transactions of a `ledger` response with `transactions` and `expand`.
+
+    Accepts the raw JSON-RPC response, its `result`, the `ledger` object or
+    a plain list of transactions.
+    """
+    if isinstance(data, dict):
+        data = data.get("result", data)
+        data = data.get("ledger", data)
+        data = data.get("transactions", [])
+    return [item for item in data if isinstance(item, dict)]
+
+
+def load_transactions(path: str, config=None) -> List[dict]:
+    """Load transactions from a JSON or JSONL file, or an `s3://bucket/key` dump."""
+    if path.startswith("s3://"):
+        bucket, key = path.replace("s3://", "").split("/", 1)
+        return unwrap_transactions(read_s3_json(config, bucket, key))
+    with open(path, "r") as f:
+        if path.endswith(".jsonl"):
+            return unwrap_transactions([json.loads(line) for line in f if line.strip()])
+        return unwrap_transactions(json.load(f))
+
+
+def in_shard(key: str, shard_index: int, shard_count: int) -> bool:
+    """Stable across processes and runs, unlike the salted built-in `hash`."""
+    return zlib.crc32(key.encode("utf-8")) % shard_count == shard_index
 
 
 def chunks(lst, n):
@@ -63,12 +163,46 @@ def fetch_account_info(address: str):
         ],
     }
     response = requests.post(JSON_RPC_URL, data=json.dumps(payload))
-    if response.status_code == 200:
-        return response.json()["result"]["account_data"]
-    return None
-
-
-async def fetch_account_info_async(address: str):
+    if response.status_code != 200:
+        raise AccountInfoException(
+            f"account_info for {address} returned HTTP {response.status_code}"
+        )
+    return _account_data(address, response.json())
+
+
+def _account_data(address: str, response: dict) -> Optional[dict]:
+    """`account_data` of an account_info reply, None for an unknown account.
+
+    Any other rippled error (`tooBusy`, `slowDown`, ...) says nothing about the
+    account and is raised, so it is never cached as a missing Domain.
+    """
+    result = response.get("result", {})
+    if "error" in result:
+        if result["error"] == "actNotFound":
+            return None
+        raise AccountInfoException(
+            f"account_info for {address} failed: {result['error']}"
+        )
+    if "account_data" not in result:
+        raise AccountInfoException(f"account_info for {address} has no account_data")
+    return result["account_data"]
+
+
+async def _post_account_info(
+    session: aiohttp.ClientSession, address: str, payload: dict
+):
+    async with session.post(JSON_RPC_URL, data=json.dumps(payload)) as response:
+        if response.status != 200:
+            raise AccountInfoException(
+                f"account_info for {address} returned HTTP {response.status}"
+            )
+        content = await response.content.read()
+        return _account_data(address, json.loads(content))
+
+
+async def fetch_account_info_async(
+    address: str, session: Optional[aiohttp.ClientSession] = None
+):
     payload = {
         "method": "account_info",
         "params": [
@@ -80,16 +214,61 @@ async def fetch_account_info_async(address: str):
             }
         ],
     }
+    if session is not None:
+        return await _post_account_info(session, address, payload)
     async with aiohttp.ClientSession() as session:
+        return await _post_account_info(session, address, payload)
+
+
+async def fetch_ledger_async(
+    ledger_index, session: Optional[aiohttp.ClientSession] = None
+) -> Optional[dict]:
+    payload = {
+        "method": "ledger",
+        "params": [
+            {"ledger_index": ledger_index, "transactions": True, "expand": True}
+        ],
+    }
+
+    async def post(session):
         async with session.post(JSON_RPC_URL, data=json.dumps(payload)) as response:
             if response.status == 200:
                 content = await response.content.read()
-                data = json.loads(content)["result"]
-                return data["account_data"]
+                return json.loads(content)["result"].get("ledger")
             return None
 
+    if session is not None:
+        return await post(session)
+    async with aiohttp.ClientSession() as session:
+        return await post(session)
+
+
+def fetch_account_domain(address: str) -> Optional[str]:
+    """The decoded Domain, None if the account has none or does not exist.
+
+    Transport, HTTP and RPC errors raise AccountInfoException or the client's
+    own exception rather than reading as a missing Domain.
+    """
+    account_data = fetch_account_info(address)
+    if not account_data or "Domain" not in account_data:
+        return None
+    return hex_to_text(account_data["Domain"])
 
-async def delete_from_s3(bucket, key, config):
+
+async def fetch_account_domain_async(
+    address: str, session: Optional[aiohttp.ClientSession] = None
+) -> Optional[str]:
+    account_data = await fetch_account_info_async(address, session=session)
+    if not account_data or "Domain" not in account_data:
+        return None
+    return hex_to_text(account_data["Domain"])
+
+
+async def delete_from_s3(bucket, key, config, s3=None):
+    if s3 is not None:
+        await s3.delete_object(Bucket=bucket, Key=key)
+        logger.info(f"{bucket}/{key} Deleted")
+        return
     session = aioboto3.Session(
         aws_access_key_id=config.ACCESS_KEY_ID,
         aws_secret_access_key=config.SECRET_ACCESS_KEY,
@@ -99,51 +278,68 @@ async def delete_from_s3(bucket, key, config):
     logger.info(f"{bucket}/{key} Deleted")
 
 
-async def read_file(key, config, bucket):
+async def _read_object(s3, bucket, key):
+    try:
+        res = await s3.get_object(Bucket=bucket, Key=key)
+    except Exception:  # noqa
+        return None
+    body = res["Body"]
+    data = await body.read()
+    return data
+
+
+async def read_file(key, config, bucket, s3=None):
+    if s3 is not None:
+        return await _read_object(s3, bucket, key)
     session = aioboto3.Session(
         aws_access_key_id=config.ACCESS_KEY_ID,
         aws_secret_access_key=config.SECRET_ACCESS_KEY,
     )
     async with session.client("s3") as s3:
-        try:
-            res = await s3.get_object(Bucket=bucket, Key=key)
-        except Exception:  # noqa
-            return None
-        body = res["Body"]
-        data = await body.read()
-        return data
+        return await _read_object(s3, bucket, key)
 
 
-async def read_json(bucket, key, config):
-    data = await read_file(key, config, bucket)
+async def read_json(bucket, key, config, s3=None):
+    data = await read_file(key, config, bucket, s3=s3)
     return json.loads(data)
 
 
-def fetch_failed_objects(config):
-    s3 = boto3.resource(
-        "s3",
+async def _iter_keys(
+    s3, bucket: str, prefix: str, start_after: Optional[str] = None
+) -> AsyncIterator[str]:
+    params = {"Bucket": bucket, "Prefix": prefix}
+    if start_after is not None:
+        params["StartAfter"] = start_after
+    paginator = s3.get_paginator("list_objects_v2")
+    async for page in paginator.paginate(**params):
+        for obj in page.get("Contents", []):
+            yield obj["Key"]
+
+
+async def iter_s3_folder_contents(
+    config, prefix, bucket, s3=None, start_after=None
+) -> AsyncIterator[str]:
+    """Keys under `prefix`, one ListObjectsV2 page (up to 1000 keys) at a time."""
+    if s3 is not None:
+        async for key in _iter_keys(s3, bucket, prefix, start_after):
+            yield key
+        return
+    session = aioboto3.Session(
         aws_access_key_id=config.ACCESS_KEY_ID,
         aws_secret_access_key=config.SECRET_ACCESS_KEY,
     )
-    bucket = s3.Bucket(config.CACHE_FAILED_LOG_BUCKET)
-    return [obj.key for obj in bucket.objects.filter(Prefix="notfound/")]
+    async with session.client("s3") as s3:
+        async for key in _iter_keys(s3, bucket, prefix, start_after):
+            yield key
 
 
-def fetch_s3_folder_contents(config, prefix, bucket):
-    s3 = boto3.resource(
-        "s3",
-        aws_access_key_id=config.ACCESS_KEY_ID,
-        aws_secret_access_key=config.SECRET_ACCESS_KEY,
+def iter_failed_objects(config, s3=None) -> AsyncIterator[str]:
+    return iter_s3_folder_contents(
+        config, "notfound/", config.CACHE_FAILED_LOG_BUCKET, s3=s3
     )
-    bucket = s3.Bucket(bucket)
-    return [obj.key for obj in bucket.objects.filter(Prefix=prefix)]
 
 
-def fetch_text_objects(config):
-    s3 = boto3.resource(
-        "s3",
-        aws_access_key_id=config.ACCESS_KEY_ID,
-        aws_secret_access_key=config.SECRET_ACCESS_KEY,
+def iter_text_objects(config, s3=None, start_after=None) -> AsyncIterator[str]:
+    return iter_s3_folder_contents(
+        config, "assets/text", config.DATA_DUMP_BUCKET, s3=s3, start_after=start_after
     )
-    bucket = s3.Bucket(config.DATA_DUMP_BUCKET)
-    return [obj.key for obj in bucket.objects.filter(Prefix="assets/text")]
@@ -1,5 +1,10 @@
+from contextlib import asynccontextmanager
+from typing import Iterable, Optional, Tuple
 import aioboto3
+import asyncio
+import copy
 from config import Config
+from image_processor import ImageWorkerPool, encode_image, image_pool
 from io import BytesIO
 import json
 import logging
@@ -12,31 +17,199 @@ class LocalFileWriter:
 
 
 class AsyncS3FileWriter:
-    def __init__(self):
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        image_pool: ImageWorkerPool = image_pool,
+    ):
         self.bucket = Config.DATA_DUMP_BUCKET
+        self.image_pool = image_pool
         self.access_key_id = Config.ACCESS_KEY_ID
         self.secret_access_key = Config.SECRET_ACCESS_KEY
+        self.max_concurrency = max_concurrency or Config.S3_WRITE_CONCURRENCY
+        self._client_context = None
+        self._client = None
+        self._semaphore = None
 
-    async def _write(self, path, buffer, content_type):
-        logger.info(
-            f"Uploading File to {self.bucket}/{path} with content Type {content_type}"
-        )
-        session = aioboto3.Session(
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def client(self):
+        return self._client
+
+    def for_bucket(self, bucket: str) -> "AsyncS3FileWriter":
+        """A writer to `bucket` that shares this writer's client and limit.
+
+        Only the original writer should be closed.
+        """
+        writer = copy.copy(self)
+        writer.bucket = bucket
+        return writer
+
+    def _session(self):
+        return aioboto3.Session(
             aws_access_key_id=self.access_key_id,
             aws_secret_access_key=self.secret_access_key,
         )
+
+    async def open(self):
+        if self._client is not None:
+            return
+        self._client_context = self._session().client("s3")
+        self._client = await self._client_context.__aenter__()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self._client_context is None:
+            return
+        client_context = self._client_context
+        self._client_context = None
+        self._client = None
+        self._semaphore = None
+        await client_context.__aexit__(None, None, None)
+
+    async def _upload(self, s3, path, buffer, content_type):
         buffer.seek(0)
-        async with session.client("s3") as s3:
-            await s3.upload_fileobj(
-                buffer, self.bucket, path, ExtraArgs={"ContentType": content_type}
-            )
+        await s3.upload_fileobj(
+            buffer, self.bucket, path, ExtraArgs={"ContentType": content_type}
+        )
+
+    async def _write(self, path, buffer, content_type):
+        logger.info(
+            f"Uploading File to {self.bucket}/{path} with content Type {content_type}"
+        )
+        if self._client is None:
+            # Writer used outside of `async with`: fall back to a one-off client.
+            async with self._session().client("s3") as s3:
+                await self._upload(s3, path, buffer, content_type)
+        else:
+            async with self._semaphore:
+                await self._upload(self._client, path, buffer, content_type)
         logger.info(f"File Uploaded to {self.bucket}/{path}")
 
+    @asynccontextmanager
+    async def _slot(self):
+        """One of the S3_WRITE_CONCURRENCY slots, when the writer is open."""
+        if self._semaphore is None:
+            yield
+            return
+        async with self._semaphore:
+            yield
+
+    async def _upload_part(self, s3, path, upload_id, parts, body):
+        async with self._slot():
+            part = await s3.upload_part(
+                Bucket=self.bucket,
+                Key=path,
+                UploadId=upload_id,
+                PartNumber=len(parts) + 1,
+                Body=body,
+            )
+        parts.append({"ETag": part["ETag"], "PartNumber": len(parts) + 1})
+
+    async def _put_stream(self, s3, path, chunks, content_type) -> int:
+        # A slot is held per S3 request only, never while waiting on `chunks`,
+        # so a slow download does not hold up other writes.
+        part_size = Config.S3_MULTIPART_PART_SIZE
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+        size = 0
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                size += len(chunk)
+                if len(buffer) < part_size:
+                    continue
+                if upload_id is None:
+                    async with self._slot():
+                        upload = await s3.create_multipart_upload(
+                            Bucket=self.bucket, Key=path, ContentType=content_type
+                        )
+                    upload_id = upload["UploadId"]
+                await self._upload_part(s3, path, upload_id, parts, bytes(buffer))
+                buffer.clear()
+            if upload_id is None:
+                async with self._slot():
+                    await s3.put_object(
+                        Bucket=self.bucket,
+                        Key=path,
+                        Body=bytes(buffer),
+                        ContentType=content_type,
+                    )
+                return size
+            if buffer:
+                await self._upload_part(s3, path, upload_id, parts, bytes(buffer))
+            async with self._slot():
+                await s3.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=path,
+                    UploadId=upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+            return size
+        except BaseException:
+            if upload_id is not None:
+                await s3.abort_multipart_upload(
+                    Bucket=self.bucket, Key=path, UploadId=upload_id
+                )
+            raise
+
+    async def write_stream(self, path, chunks, content_type) -> int:
+        """Upload an async iterable of byte chunks without holding it in memory.
+
+        Content is sent as an S3 multipart upload in S3_MULTIPART_PART_SIZE
+        parts; anything smaller than one part is sent as a single put. Returns
+        the number of bytes written.
+        """
+        logger.info(
+            f"Streaming File to {self.bucket}/{path} with content Type {content_type}"
+        )
+        if self._client is None:
+            async with self._session().client("s3") as s3:
+                size = await self._put_stream(s3, path, chunks, content_type)
+        else:
+            size = await self._put_stream(self._client, path, chunks, content_type)
+        logger.info(f"File Uploaded to {self.bucket}/{path} ({size} bytes)")
+        return size
+
+    async def copy(self, source_path, path, content_type):
+        copy_args = dict(
+            Bucket=self.bucket,
+            Key=path,
+            CopySource={"Bucket": self.bucket, "Key": source_path},
+            ContentType=content_type,
+            MetadataDirective="REPLACE",
+        )
+        if self._client is None:
+            async with self._session().client("s3") as s3:
+                await s3.copy_object(**copy_args)
+        else:
+            async with self._semaphore:
+                await self._client.copy_object(**copy_args)
+        logger.info(f"File Copied from {self.bucket}/{source_path} to {path}")
+
+    async def write_many(self, items: Iterable[Tuple[str, bytes, str]]):
+        """Upload (path, content, content_type) items concurrently.
+
+        Every upload gets its own buffer so the same content can be written to
+        several keys at once.
+        """
+        await asyncio.gather(
+            *[
+                self._write(path, BytesIO(content), content_type)
+                for path, content, content_type in items
+            ]
+        )
+
     async def write_image(self, path, image, content_type):
-        buffer = BytesIO()
-        fmt = content_type.split("/")[-1]
-        image.save(buffer, format=fmt.upper())
-        await self._write(path, buffer, content_type)
+        content = await self.image_pool.run(encode_image, image, content_type)
+        await self._write(path, BytesIO(content), content_type)
 
     async def write_json(self, path, obj):
         to_bytes = json.dumps(obj, indent=4).encode("utf-8")